@@ -0,0 +1,269 @@
+# benchmarks/run_benchmarks.py
+"""各处理阶段的性能基准：加载、匹配、内容合并、Word 渲染与保存（python-docx 与直接写出 XML 两种方式）。
+
+生成指定规模的合成 HTS DB 与邮件模板工作簿，按不同批量分别计时，输出吞吐量、p50/p99 延迟与峰值内存，
+并保存为 JSON，便于与其他版本的结果对比。
+
+用法示例:
+    python benchmarks/run_benchmarks.py --db-rows 5000 --batch-sizes 100 1000 10000 -o bench.json
+    python benchmarks/run_benchmarks.py --compare bench_old.json -o bench_new.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from openpyxl import Workbook  # noqa: E402
+from src.core.hts_index import HTSPrefixIndex  # noqa: E402
+from src.core.matcher import HTSMatcher  # noqa: E402
+from src.core.email_content import EmailContentExtractor, LabelTable  # noqa: E402
+from src.core.formatter import WordFormatter  # noqa: E402
+from src.core.xml_formatter import XmlWordFormatter  # noqa: E402
+from src.data.hts_data_loader import HTSDataLoader  # noqa: E402
+from src.data.email_template_loader import EmailTemplateLoader  # noqa: E402
+from src.utils.helpers import percentile  # noqa: E402
+from src.utils.lru_cache import LRUCache  # noqa: E402
+from config.settings import EMAIL_MAPPING  # noqa: E402
+
+
+def synthesize_hts_db(file_path, rows, rng):
+    """生成合成的 HTS DB：列名与 EMAIL_MAPPING 一致，编码为 4~10 位数字，按 Excel 数值写入"""
+    workbook = Workbook()
+    sheet = workbook.active
+    columns = list(EMAIL_MAPPING)
+    sheet.append(columns)
+    for _ in range(rows):
+        row = []
+        for _ in columns:
+            if rng.random() < 0.3:
+                row.append(None)
+            else:
+                row.append(int(str(rng.randint(1, 99)).zfill(2) + ''.join(
+                    rng.choice('0123456789') for _ in range(rng.choice((2, 4, 6, 8)))
+                )))
+        sheet.append(row)
+    workbook.save(file_path)
+
+
+def synthesize_blurbs(file_path, blurb_length, rng):
+    """生成合成的邮件模板：覆盖 EMAIL_MAPPING 中的所有标签，正文带红色/加粗标签"""
+    labels = []
+    for value in EMAIL_MAPPING.values():
+        for label in value.split(','):
+            if label.strip() not in labels:
+                labels.append(label.strip())
+
+    def blurb(words):
+        parts = []
+        for i in range(words):
+            word = f"word{rng.randint(0, 999)}"
+            tag = rng.choice((None, None, None, 'RED', 'BOLD', 'REDBOLD'))
+            parts.append(f"<{tag}>{word}</{tag}>" if tag else word)
+            if i % 12 == 11:
+                parts.append('\n')
+        return ' '.join(parts)
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['Issue Details Description', 'English Email Blurb', 'Chinese Email Blurb'])
+    for label in labels:
+        sheet.append([label, blurb(blurb_length), blurb(blurb_length)])
+    workbook.save(file_path)
+
+
+def synthesize_codes(index, count, rng):
+    """生成输入编码：一半由 DB 编码延长而来（必然匹配），一半为随机 10 位编码"""
+    db_codes = list(index.code_masks)
+    codes = []
+    for i in range(count):
+        if db_codes and i % 2 == 0:
+            base = rng.choice(db_codes)
+            codes.append(base + ''.join(rng.choice('0123456789') for _ in range(max(10 - len(base), 0))))
+        else:
+            codes.append(str(rng.randint(10 ** 9, 10 ** 10 - 1)))
+    return codes
+
+
+def peak_memory_kb(func):
+    """以 tracemalloc 统计执行 func() 期间的峰值内存（只含 Python 层分配，lxml 的 C 层内存见 peak_rss_kb）"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(func, items, repeat_memory=True):
+    """逐项计时，并单独再跑一遍统计峰值内存（避免内存追踪影响计时）"""
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        item_start = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - item_start)
+    elapsed = time.perf_counter() - start
+
+    peak_kb = None
+    if repeat_memory:
+        peak_kb = peak_memory_kb(lambda: [func(item) for item in items])
+
+    latencies.sort()
+    return {
+        'ops': len(latencies),
+        'total_s': elapsed,
+        'throughput_per_s': len(latencies) / elapsed if elapsed else None,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0) * 1000,
+        'peak_mem_kb': peak_kb
+    }
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, 'HTS_DB.xlsx')
+        blurb_path = os.path.join(work_dir, 'EmailBlurb.xlsx')
+        synthesize_hts_db(db_path, args.db_rows, rng)
+        synthesize_blurbs(blurb_path, args.blurb_words, rng)
+
+        def record(stage, batch_size, stats):
+            stats.update({'stage': stage, 'batch_size': batch_size})
+            results.append(stats)
+            print(f"{stage:<24} batch={batch_size:<7} {stats['throughput_per_s'] or 0:>12.1f} ops/s  "
+                  f"p50 {stats['p50_ms']:8.3f} ms  p99 {stats['p99_ms']:8.3f} ms  "
+                  f"peak {stats['peak_mem_kb'] or 0:10.1f} KB")
+
+        repeats = range(args.load_repeat)
+        record('load_db', 1, measure(lambda _: HTSDataLoader.load_hts_database(db_path), repeats))
+        df = HTSDataLoader.load_hts_database(db_path)
+        record('build_index', 1, measure(lambda _: HTSPrefixIndex.from_dataframe(df), repeats))
+        record('load_index_cells', 1, measure(lambda _: HTSDataLoader.build_index_from_cells(db_path), repeats))
+        for backend in ('pandas', 'openpyxl'):
+            record(f'load_templates_{backend}', 1, measure(
+                lambda _: EmailTemplateLoader.load_email_templates(blurb_path, backend=backend), repeats))
+
+        matcher = HTSMatcher(df)
+        templates = EmailTemplateLoader.load_email_templates(blurb_path, backend='pandas')
+        label_table = LabelTable(matcher.index.columns, templates)
+
+        for batch_size in args.batch_sizes:
+            codes = synthesize_codes(matcher.index, batch_size, rng)
+            record('match', batch_size, measure(matcher.lookup, codes))
+            record('match_many', batch_size, measure(matcher.match_many, [codes]))
+            record('lookup_many', batch_size, measure(matcher.lookup_many, [codes]))
+
+            matched = [matcher.lookup(code) for code in codes]
+            # 与 HTSProcessor 相同，经 EmailContentExtractor 并传入预先构建的 LabelTable
+            record('extract', batch_size, measure(
+                lambda columns: EmailContentExtractor.extract_and_merge_content(columns, templates, label_table),
+                matched))
+
+            parts = [label_table.merge(columns) for columns in matched]
+            parts = [p for p in parts if p[0] or p[2]]
+
+            def render_all(formatter):
+                def render(content):
+                    en_text, en_styles, ch_text, ch_styles = content
+                    if en_text:
+                        formatter.format_and_save_word(en_text, en_styles, None, 'EN')
+                    if ch_text:
+                        formatter.format_and_save_word(ch_text, ch_styles, None, 'CH')
+                return render
+
+            # 两种 Word 生成方式（settings.WORD_BACKEND）各自计时；python-docx 沿用原阶段名，便于与旧结果对比
+            for suffix, formatter_class in (('', WordFormatter), ('_xml', XmlWordFormatter)):
+                docx_path = os.path.join(work_dir, f'bench_{batch_size}{suffix}.docx')
+                # 渲染会向文档追加内容，内存统计使用另一个新文档，避免计时用的文档被写入两遍
+                for stage, make_cache in (('render', lambda: None), ('render_cached', lambda: LRUCache(256))):
+                    formatter = formatter_class(docx_path, make_cache())
+                    stats = measure(render_all(formatter), parts, repeat_memory=False)
+                    memory_formatter = formatter_class(docx_path, make_cache())
+                    stats['peak_mem_kb'] = peak_memory_kb(
+                        lambda f=memory_formatter: [render_all(f)(p) for p in parts])
+                    record(stage.replace('render', 'render' + suffix), batch_size, stats)
+
+                save_stats = measure(lambda _: formatter.save(), [None], repeat_memory=False)
+                save_stats['file_kb'] = os.path.getsize(docx_path) / 1024
+                record('save' + suffix, batch_size, save_stats)
+
+    return results
+
+
+def peak_rss_kb():
+    """进程峰值 RSS（仅类 Unix 平台可用）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return rss / 1024 if sys.platform == 'darwin' else rss
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline_file):
+    """与之前保存的结果对比吞吐量，输出比值（>1 表示变快）"""
+    with open(baseline_file, encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['stage'], r['batch_size']): r for r in baseline['results']}
+    print(f"\n与 {baseline_file}（{baseline.get('git_revision')}）对比:")
+    for stats in current:
+        old = previous.get((stats['stage'], stats['batch_size']))
+        if not old or not old.get('throughput_per_s') or not stats.get('throughput_per_s'):
+            continue
+        ratio = stats['throughput_per_s'] / old['throughput_per_s']
+        flag = '  <-- 回退' if ratio < 0.9 else ''
+        print(f"{stats['stage']:<24} batch={stats['batch_size']:<7} x{ratio:.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTS 邮件生成器性能基准")
+    parser.add_argument('--db-rows', type=int, default=2000, help="合成 HTS DB 的行数")
+    parser.add_argument('--blurb-words', type=int, default=80, help="每条合成邮件模板的词数")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 1000, 5000], help="编码批量大小")
+    parser.add_argument('--load-repeat', type=int, default=3, help="加载阶段重复次数")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    parser.add_argument('-o', '--output', default='bench_results.json', help="JSON 结果文件")
+    parser.add_argument('--compare', help="与之前保存的 JSON 结果对比")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'peak_rss_kb': peak_rss_kb(),
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,20 @@
 import subprocess
 import sys
 import os
+from config.settings import LOADER_BACKEND, HTS_DB_FILENAME, EMAIL_TEMPLATE_FILENAME, DATA_BUNDLE_FILENAME
+from src.data.bundled_data import DataBundle
+
+
+def build_data_bundle(bundle_file):
+    """将 HTS 数据库与邮件模板预编译为数据快照，打包进 exe 代替原始工作簿"""
+    print(f"生成数据快照: {bundle_file}")
+    try:
+        info = DataBundle.build(os.path.basename(HTS_DB_FILENAME), os.path.basename(EMAIL_TEMPLATE_FILENAME),
+                                bundle_file)
+    except Exception as e:
+        print(f"生成数据快照失败: {e}")
+        sys.exit(1)
+    print(f"数据快照已生成: {info['codes']} 个编码，{info['labels']} 个模板标签，{info['size'] / 1024:.1f} KB")
 
 
 def main():
@@ -9,6 +23,12 @@ def main():
     # 入口点改为 main.py
     main_script = "src/main.py"
     exe_name = "HTS_Email_Generator_GUI"
+    # 数据快照写入 PyInstaller 的 build 目录，不留在项目根目录（否则开发环境运行时会把它当作内置数据读取）
+    bundle_file = f"build/{os.path.basename(DATA_BUNDLE_FILENAME)}"
+
+    # 每次构建都重新生成数据快照，exe 内置的数据与当前工作簿一致
+    os.makedirs(os.path.dirname(bundle_file), exist_ok=True)
+    build_data_bundle(bundle_file)
 
     if not os.path.exists(spec_file):
         print(f"生成 .spec 文件: {spec_file}")
@@ -16,11 +36,14 @@ def main():
             sys.executable, "-m", "PyInstaller",
             "--onefile",
             "--noconsole",
-            "--add-data", "HTS_DB.xlsx;.",  # 注意：Windows 用 ; 分隔
-            "--add-data", "EmailBlurb.xlsx;.",
+            # 打包预编译的数据快照而非原始工作簿；注意：Windows 用 ; 分隔
+            "--add-data", f"{bundle_file};.",
             "--name", exe_name,
             main_script
         ]
+        if LOADER_BACKEND != 'pandas':
+            # 使用 openpyxl 只读加载时不需要 pandas，排除后单文件 exe 更小、解压启动更快
+            cmd[-1:-1] = ["--exclude-module", "pandas"]
         result = subprocess.run(cmd, capture_output=True, text=True)
         if result.returncode != 0:
             print("生成 .spec 文件失败:")
@@ -29,6 +52,10 @@ def main():
         print(f".spec 文件已生成: {spec_file}")
     else:
         print(f"使用已存在的 .spec 文件: {spec_file}")
+        with open(spec_file, encoding='utf-8') as f:
+            if bundle_file not in f.read():
+                print(f"警告: .spec 文件未包含数据快照 {bundle_file}（或引用的是旧位置的快照），exe 内置的数据可能缺失或过期；"
+                      f"删除 .spec 文件后重新运行即可重新生成")
 
     print("开始使用 PyInstaller 构建...")
     cmd = [sys.executable, "-m", "PyInstaller", spec_file]
@@ -3,6 +3,103 @@
 # --- 文件路径 ---
 HTS_DB_FILENAME = "../HTS_DB.xlsx"
 EMAIL_TEMPLATE_FILENAME = "../EmailBlurb.xlsx"
+# 构建时预编译的数据快照（build_exe.py 生成并打包进 exe），启动时优先读取
+DATA_BUNDLE_FILENAME = "../HTS_Data.bin"
+
+# --- 解析缓存 ---
+# 启用后将解析好的 HTS 索引和邮件模板缓存为二进制文件，文件未变化时跳过 Excel 解析
+DATA_CACHE_ENABLED = True
+# 缓存目录，None 表示使用用户缓存目录
+DATA_CACHE_DIR = None
+
+# --- Excel 读取方式 ---
+# 'pandas' 使用 pandas.read_excel；'openpyxl' 以只读模式逐行读取单元格，无需 pandas（启动更快、打包体积更小），
+# 但全为数字的文本列会保留前导零（pandas 会转为数值），匹配结果可能不同
+LOADER_BACKEND = 'pandas'
+
+# --- 批量匹配 ---
+# 一次处理的编码数超过该值时，使用 HTSMatcher.lookup_many 一次性批量匹配（相同列组合只展开一次）
+MATCH_MANY_THRESHOLD = 8
+
+# --- 结果缓存 (LRU) ---
+# 编码 -> 匹配列 的缓存条目数
+CODE_CACHE_SIZE = 4096
+# 匹配列组合 -> 合并后邮件内容 的缓存条目数
+CONTENT_CACHE_SIZE = 256
+# (语言, 邮件内容组合) -> 已渲染 Word 正文片段 的缓存条目数，0 表示不复用
+FRAGMENT_CACHE_SIZE = 256
+
+# --- Word 输出 ---
+# 'python-docx' 通过 python-docx 对象模型逐段构建；'xml' 直接写出 WordprocessingML（更快，内容与 python-docx 一致，
+# 两者的渲染与保存耗时见 benchmarks 中的 render / save 与 render_xml / save_xml 阶段）
+WORD_BACKEND = 'python-docx'
+# 每个 Word 文件包含的编码数量，超过后滚动写入新文件（并生成 *_index.json 索引）；0 表示输出单个文件
+OUTPUT_SHARD_SIZE = 0
+
+# --- 多进程批处理 ---
+# 工作进程数量，0 或 1 表示在当前进程内串行处理。
+# 只在 WORD_BACKEND = 'xml' 时有效：python-docx 只能在主进程渲染，多进程反而更慢，此时批处理仍在当前进程内进行
+PROCESS_POOL_WORKERS = 0
+# 每个工作进程一次处理的编码数量；编码总数不超过该值时不启用进程池
+PROCESS_POOL_CHUNK_SIZE = 100
+
+# --- 进程内流水线 ---
+# 启用后批处理按 匹配 → 合并 → 渲染 → 写出 四个阶段并行执行，阶段之间以有界队列连接，
+# 写满的 Word 分片在后台线程保存，磁盘写出与后续编码的处理重叠进行；可使用多进程批处理时多进程优先。
+# 渲染线程只在 WORD_BACKEND = 'xml' 时生成正文；python-docx 的正文片段跨线程传递后需重新解析，比串行慢数倍，
+# 因此改由写出阶段按顺序渲染，此时流水线的收益主要来自分片的后台保存
+PIPELINE_ENABLED = False
+# 匹配、合并、渲染阶段的工作线程数（写出阶段在调用方线程中按输入顺序进行），
+# 以及分片输出时后台保存分片的线程数（同时在保存的分片数）
+PIPELINE_WORKERS = {'match': 1, 'merge': 1, 'render': 1, 'save': 2}
+# 编码按批在阶段之间传递，每批的编码数（匹配阶段按批批量匹配）
+PIPELINE_BATCH_SIZE = 256
+# 阶段之间每个队列的容量（批数）；队列满时上游阶段等待，在途编码数有上界
+PIPELINE_QUEUE_SIZE = 4
+
+# --- 性能剖析 ---
+# None 关闭；'cprofile' 每批保存 HTS_profile_*.prof；'tracemalloc' 统计内存分配热点
+PROFILE_MODE = None
+
+# --- 数据热更新 ---
+# 界面运行期间监视 HTS DB 与邮件模板文件，内容变化后在后台重新加载
+HOT_RELOAD_ENABLED = True
+# 检查文件变化的间隔（秒）
+HOT_RELOAD_INTERVAL = 2.0
+
+# --- 历史记录 ---
+# 界面生成的结果保存在 SQLite 数据库中，重启后仍可查看；None 表示用户数据目录下的 history.sqlite3
+HISTORY_DB_PATH = None
+# 历史记录列表每页显示的条数（界面只保留当前页）
+HISTORY_PAGE_SIZE = 200
+# 最多保留的历史记录条数，超出时删除最早的记录；0 表示不限制
+HISTORY_MAX_ROWS = 100000
+
+# --- 界面日志 ---
+# 日志框最多保留的行数，超出时删除最早的行
+GUI_LOG_MAX_LINES = 5000
+# 每次轮询最多取出的队列消息数，合并为一次插入；队列仍有积压时缩短下次轮询间隔
+GUI_LOG_BATCH_SIZE = 2000
+
+# --- 输入联想 ---
+# 输入编码时列出以当前输入为前缀的 DB 编码及其匹配的列与标签；输入不足 SUGGEST_MIN_DIGITS 位时不联想
+SUGGEST_MIN_DIGITS = 2
+# 最多显示的候选编码数
+SUGGEST_LIMIT = 20
+# 停止输入多少毫秒后才查询，连续按键只查询最后一次
+SUGGEST_DELAY_MS = 150
+
+# --- HTTP 服务 (python -m src.service) ---
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+# 生成 Word 文档的工作进程数；0 或 1 表示在服务进程的线程池中生成
+SERVICE_WORKERS = 2
+# 单个请求最多包含的编码数
+SERVICE_MAX_CODES = 10000
+# keep-alive 连接等待下一个请求的最长空闲时间（秒），超时后关闭连接
+SERVICE_IDLE_TIMEOUT = 60
+# 读取一个请求的请求头与请求体的最长时间（秒），超时返回 408 并关闭连接
+SERVICE_READ_TIMEOUT = 30
 
 # --- 邮件标签映射表 (HTS DB 列名 -> 邮件标签) ---
 EMAIL_MAPPING = {
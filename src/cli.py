@@ -0,0 +1,277 @@
+# src/cli.py
+"""无界面批处理入口：从文件或标准输入流式读取 HTS 编码，生成 Word 文档和机器可读的结果文件，
+也可同时（或只）输出 HTML、纯文本与 .eml 邮件草稿。
+
+用法示例:
+    python -m src.cli -i codes.txt -o HTS_Email.docx -r results.jsonl
+    cat codes.csv | python -m src.cli --csv-column "HTS Code"
+    python -m src.cli -i codes.txt --no-docx --html HTS_Email.html --eml-dir eml
+    python -m src.cli --incremental last_results.jsonl -r results.jsonl -o HTS_Email_changed.docx
+"""
+import argparse
+import csv
+import itertools
+import json
+import re
+import sys
+import time
+
+from src.core.processor import HTSProcessor
+from src.core.output_sinks import JsonlSink, TextSink, HtmlSink, EmlSink
+from src.core.incremental import load_previous_results, diff_previous_results, format_change_report
+from src.core.instrumentation import stage_timer, profiling
+from src.data.hts_data_loader import HTSDataLoader
+from src.data.email_template_loader import EmailTemplateLoader
+from src.data.data_cache import DataCache
+from src.utils.helpers import source_dir_path, percentile
+from config.settings import HTS_DB_FILENAME, EMAIL_TEMPLATE_FILENAME, DATA_CACHE_ENABLED
+
+CODE_SEPARATOR = re.compile(r'[\s,;]+')
+
+
+def iter_codes(stream, csv_column=None, keep_duplicates=False):
+    """逐行读取输入流并产出编码；csv_column 为列名或列序号时按 CSV 解析"""
+    if csv_column is None:
+        tokens = (token for line in stream for token in CODE_SEPARATOR.split(line))
+    else:
+        reader = csv.reader(stream)
+        if csv_column.isdigit():
+            column_pos = int(csv_column)
+        else:
+            header = next(reader, [])
+            try:
+                column_pos = [name.strip() for name in header].index(csv_column)
+            except ValueError:
+                raise ValueError(f"CSV 中不存在列: {csv_column}")
+        tokens = (row[column_pos] for row in reader if len(row) > column_pos)
+
+    seen = set()
+    for token in tokens:
+        code = token.strip()
+        if not code:
+            continue
+        if not keep_duplicates:
+            if code in seen:
+                continue
+            seen.add(code)
+        yield code
+
+
+def iter_chunks(iterable, chunk_size):
+    """按固定大小切分迭代器，每次只在内存中保留一个分块"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_stage_workers(value):
+    """解析 --stage-workers，如 'match=1,merge=1,render=2,save=2'"""
+    workers = {}
+    for item in value.split(','):
+        stage, _, count = item.partition('=')
+        stage = stage.strip()
+        if stage not in ('match', 'merge', 'render', 'save') or not count.strip().isdigit() or int(count) < 1:
+            raise argparse.ArgumentTypeError(f"无效的阶段线程数: {item}（格式如 match=1,merge=1,render=2,save=2）")
+        workers[stage] = int(count)
+    return workers
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="HTS 邮件生成器（无界面批处理）")
+    parser.add_argument('-i', '--input', default='-', help="编码输入文件（TXT/CSV），'-' 表示标准输入")
+    parser.add_argument('--csv-column', help="按 CSV 解析输入，并读取该列（列名或从 0 开始的序号）")
+    parser.add_argument('-o', '--output', default='HTS_Email.docx', help="输出的 Word 文件")
+    parser.add_argument('-r', '--results', default='HTS_Email_results.jsonl', help="输出的 JSONL 结果文件")
+    parser.add_argument('--no-docx', action='store_true', help="不生成 Word 文档（只输出结果文件及下列格式）")
+    parser.add_argument('--html', help="输出保留红色/加粗样式的 HTML 文件")
+    parser.add_argument('--text', help="输出纯文本邮件文件")
+    parser.add_argument('--eml-dir', help="为每个有邮件内容的编码在该目录下生成 .eml 邮件草稿")
+    # 默认使用项目根目录下的数据文件，与运行时的当前目录无关
+    parser.add_argument('--hts-db', default=source_dir_path(HTS_DB_FILENAME), help="HTS 数据库文件")
+    parser.add_argument('--templates', default=source_dir_path(EMAIL_TEMPLATE_FILENAME), help="邮件模板文件")
+    parser.add_argument('--chunk-size', type=int, default=500, help="每次读取并处理的编码数量")
+    parser.add_argument('--shard-size', type=int, default=None,
+                        help="每个 Word 文件包含的编码数，超过后滚动输出新文件；1 表示每个编码一个文件")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="多进程处理的工作进程数（默认取 settings.PROCESS_POOL_WORKERS；"
+                             "只在 settings.WORD_BACKEND 为 'xml' 或使用 --no-docx 时生效）")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="使用进程内流水线（匹配 → 合并 → 渲染 → 写出 各阶段并行，阶段间有界队列）")
+    parser.add_argument('--stage-workers', type=parse_stage_workers,
+                        help="流水线各阶段线程数，如 match=1,merge=1,render=2,save=2（save 为后台保存分片的线程数；"
+                             "默认取 settings.PIPELINE_WORKERS）")
+    parser.add_argument('--queue-size', type=int, help="流水线阶段间队列容量，单位为批（默认取 settings.PIPELINE_QUEUE_SIZE）")
+    parser.add_argument('--keep-duplicates', action='store_true', help="保留重复编码（默认去重并保持顺序）")
+    parser.add_argument('--audit', action='store_true',
+                        help="在结果文件中记录每个匹配列来自哪个 DB 编码及其位数（match_sources）")
+    parser.add_argument('--incremental', metavar='PREVIOUS_RESULTS',
+                        help="增量更新：读取上次的 JSONL 结果文件，只重新生成匹配列或模板内容发生变化的编码"
+                             "（Word/HTML/纯文本/.eml 只包含这些编码，结果文件为更新后的完整结果；忽略 -i）")
+    parser.add_argument('--changes', default='HTS_Email_changes.json', help="增量更新时输出的变更报告（JSON）")
+    parser.add_argument('--events', help="将结构化统计事件（每个编码的分阶段耗时等）写入该 JSONL 文件")
+    parser.add_argument('--profile', choices=['cprofile', 'tracemalloc'], help="启用性能剖析")
+    parser.add_argument('--no-cache', action='store_true', help="不使用 Excel 解析缓存")
+    parser.add_argument('--rebuild-cache', action='store_true', help="忽略并重建 Excel 解析缓存")
+    parser.add_argument('-v', '--verbose', action='store_true', help="将处理日志输出到标准错误")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    def log(msg):
+        sys.stderr.write(msg if msg.endswith('\n') else msg + '\n')
+
+    processor_logger = (lambda msg: sys.stderr.write(msg)) if args.verbose else (lambda msg: None)
+
+    load_start = time.perf_counter()
+    cache = DataCache(logger_func=log) if DATA_CACHE_ENABLED and not args.no_cache else None
+    try:
+        hts_index = HTSDataLoader.load_hts_index(args.hts_db, cache, args.rebuild_cache)
+        email_blurbs = EmailTemplateLoader.load_email_templates(args.templates, cache, args.rebuild_cache)
+    except Exception as e:
+        log(f"❌ 加载数据失败: {e}")
+        return 1
+    processor = HTSProcessor(hts_index, email_blurbs, output_file=None if args.no_docx else args.output,
+                             workers=args.workers, shard_size=args.shard_size, profile_mode='',
+                             pipeline=True if args.pipeline else None, pipeline_workers=args.stage_workers,
+                             pipeline_queue_size=args.queue_size)
+    log(f"✅ 数据加载完成，耗时 {time.perf_counter() - load_start:.2f} 秒")
+    missing_report = processor.snapshot.label_table.missing_report()
+    if missing_report:
+        log(missing_report)
+
+    previous_records = None
+    changed_codes = []
+    if args.incremental:
+        try:
+            previous_records = load_previous_results(args.incremental)
+            changed_codes, report = diff_previous_results(processor, previous_records)
+            with open(args.changes, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            log(f"❌ 增量对比失败: {e}")
+            processor.close()
+            return 1
+        log(format_change_report(report) + f"变更报告: {args.changes}")
+        input_stream = None
+    else:
+        input_stream = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8-sig', newline='')
+    events_file = open(args.events, 'w', encoding='utf-8') if args.events else None
+    latencies = []
+    stage_totals = {}
+    pipeline_totals = {}
+    cache_hits = 0
+    matched_count = 0
+
+    def on_event(event):
+        nonlocal cache_hits
+        if event['event'] == 'code_done':
+            latencies.append(event['seconds'])
+        elif event['event'] == 'batch_done':
+            cache_hits += event['cache_hits']
+            for stage, seconds in event['stages'].items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+            for stage, stats in (event['pipeline'] or {}).items():
+                if stage == 'reorder_max':
+                    continue
+                totals = pipeline_totals.setdefault(stage, {'workers': stats['workers'], 'busy': 0.0, 'idle': 0.0,
+                                                            'blocked': 0.0, 'max_queue': 0})
+                for key in ('busy', 'idle', 'blocked'):
+                    totals[key] += stats[key]
+                totals['max_queue'] = max(totals['max_queue'], stats['max_queue'])
+        elif event['event'] == 'profile' and 'path' in event:
+            log(f"性能剖析结果: {event['path']}")
+        if events_file is not None:
+            events_file.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+    def result_fields(result):
+        # 记录所用标签的模板内容摘要，下次可据此增量更新
+        fields = {'template_versions': processor.snapshot.label_table.versions(result['matched_columns'])}
+        if args.audit:
+            fields['match_sources'] = [{'column': column, 'entry': entry, 'level': level}
+                                       for column, entry, level in processor.matcher.match_sources(result['code'])]
+        return fields
+
+    batch_start = time.perf_counter()
+    sinks = []
+    try:
+        jsonl_sink = JsonlSink(args.results, result_fields)
+        sinks.append(jsonl_sink)
+        if args.html:
+            sinks.append(HtmlSink(args.html))
+        if args.text:
+            sinks.append(TextSink(args.text))
+        if args.eml_dir:
+            sinks.append(EmlSink(args.eml_dir))
+        # 性能剖析覆盖整个批处理，而不是每个分块各生成一份
+        with profiling(args.profile, on_event):
+            if previous_records is None:
+                codes = iter_codes(input_stream, args.csv_column, args.keep_duplicates)
+                chunk_sinks = sinks
+            else:
+                # 增量更新：结果文件最后按上次的顺序整体写出，其余输出只包含重新生成的编码
+                codes = changed_codes
+                chunk_sinks = sinks[1:]
+            regenerated = {}
+            for chunk in iter_chunks(codes, args.chunk_size):
+                chunk_results = processor.process_multi_code(chunk, processor_logger, save=False, event_func=on_event,
+                                                             sinks=chunk_sinks)
+                matched_count += sum(1 for result in chunk_results if result['matched_columns'])
+                if previous_records is not None:
+                    regenerated.update((result['code'], result) for result in chunk_results)
+                log(f"已处理 {len(latencies)} 个编码")
+            if previous_records is not None:
+                with stage_timer(stage_totals, 'export'):
+                    for record in previous_records:
+                        jsonl_sink.write(regenerated.get(record['code'], record), None)
+        if processor.formatter is not None:
+            with stage_timer(stage_totals, 'save'):
+                processor.formatter.save()
+    except Exception as e:
+        log(f"❌ 批处理失败: {e}")
+        return 1
+    finally:
+        for sink in sinks:
+            sink.close()
+        processor.close()
+        if input_stream is not None and input_stream is not sys.stdin:
+            input_stream.close()
+        if events_file is not None:
+            events_file.close()
+
+    elapsed = time.perf_counter() - batch_start
+    latencies.sort()
+    total = len(latencies)
+    log(f"处理编码数: {total}（有匹配 {matched_count}，无匹配 {total - matched_count}）")
+    log(f"总耗时: {elapsed:.2f} 秒，吞吐: {total / elapsed if elapsed else 0:.1f} 编码/秒")
+    log(f"单码延迟: p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+        f"p95 {percentile(latencies, 95) * 1000:.2f} ms, "
+        f"p99 {percentile(latencies, 99) * 1000:.2f} ms, "
+        f"max {(latencies[-1] if latencies else 0) * 1000:.2f} ms")
+    log("阶段耗时: " + ", ".join(f"{stage} {seconds:.2f} 秒" for stage, seconds in stage_totals.items())
+        + f"；缓存命中 {cache_hits} 次")
+    if pipeline_totals:
+        log("流水线（线程数，忙碌 / 等待输入 / 等待下游 秒，输入队列峰值）: " + "；".join(
+            f"{stage} x{totals['workers']} {totals['busy']:.2f} / {totals['idle']:.2f} / {totals['blocked']:.2f}，"
+            f"队列峰值 {totals['max_queue']}" for stage, totals in pipeline_totals.items()))
+    outputs = [f"结果文件: {args.results}"] + [
+        f"{name}: {path}" for name, path in (('HTML', args.html), ('纯文本', args.text)) if path
+    ]
+    if args.eml_dir:
+        outputs.append(f".eml 草稿: {len(sinks[-1].files)} 个（{args.eml_dir}）")
+    if processor.formatter is None:
+        log("✅ " + "，".join(outputs))
+    elif processor.shard_size > 0:
+        log(f"✅ Word 分片: {len(processor.formatter.shards)} 个，索引: {processor.formatter.index_file}，"
+            + "，".join(outputs))
+    else:
+        log(f"✅ Word 文档: {args.output}，" + "，".join(outputs))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
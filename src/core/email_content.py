@@ -1,42 +1,123 @@
 # src/core/email_content.py
+import hashlib
 from config.settings import EMAIL_MAPPING
 
 
-class EmailContentExtractor:
-    @staticmethod
-    def extract_and_merge_content(matched_columns, email_templates):
-        """根据匹配列名提取并合并邮件内容（包含样式信息）"""
-        all_labels = []
+def split_mapping_labels(value):
+    """拆分 EMAIL_MAPPING 中以逗号分隔的标签，去除空白"""
+    return [label.strip() for label in value.split(',')]
+
+
+def template_digest(template):
+    """模板内容（英文/中文文本及样式段）的摘要，模板文件更新后只有内容变化的标签摘要不同"""
+    english_text, english_styles, chinese_text, chinese_styles = template
+    key = repr((english_text, [(run.start, run.end, run.style) for run in english_styles or ()],
+                chinese_text, [(run.start, run.end, run.style) for run in chinese_styles or ()]))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+class LabelTable:
+    """加载时由 EMAIL_MAPPING 与邮件模板预先生成的 列 -> 标签编号、标签编号 -> 模板内容 两张表
+
+    合并时不再拆分映射字符串、查找模板：逐个匹配列取出预先排好的标签编号，用整数位集去重。
+    同一标签在不同列组合中的先后顺序会变化（如铝制品与铝衍生品两列中两个 232 标签的顺序相反），
+    因此仍按匹配列顺序展开，结果与原逐列合并完全一致。模板中不存在的标签在构建时记入 missing_labels。
+    """
+
+    def __init__(self, columns, email_templates, mapping=EMAIL_MAPPING):
+        """columns: HTS DB 的列名；email_templates: 邮件模板字典"""
+        self.labels = []
+        self.missing_labels = []
+        # 标签 -> 标签编号
+        self.label_index = label_ids = {}
+        # 列 -> 该列在模板中存在的标签编号（保持书写顺序），以及对应的标签位集
+        self.column_labels = {}
+        self.column_bits = {}
+        for column in list(columns) + [column for column in mapping if column not in columns]:
+            if column not in mapping or column in self.column_labels:
+                continue
+            ids = []
+            bits = 0
+            for label in split_mapping_labels(mapping[column]):
+                if label not in email_templates:
+                    self.missing_labels.append((column, label))
+                    continue
+                label_id = label_ids.get(label)
+                if label_id is None:
+                    label_id = label_ids[label] = len(self.labels)
+                    self.labels.append(label)
+                if not bits >> label_id & 1:
+                    ids.append(label_id)
+                    bits |= 1 << label_id
+            self.column_labels[column] = tuple(ids)
+            self.column_bits[column] = bits
+
+        # 标签编号 -> (英文文本, 英文样式, 中文文本, 中文样式)
+        self.templates = [
+            (data['english_text'], data['english_styles'], data['chinese_text'], data['chinese_styles'])
+            for data in (email_templates[label] for label in self.labels)
+        ]
+        # 标签编号 -> 模板内容摘要，记入结果文件后用于增量重新生成
+        self.digests = [template_digest(template) for template in self.templates]
 
+    def missing_report(self):
+        """模板中不存在的映射标签说明；全部存在时返回空字符串"""
+        if not self.missing_labels:
+            return ""
+        details = "；".join(f"{column} -> {label}" for column, label in self.missing_labels)
+        return f"❌ EMAIL_MAPPING 中有 {len(self.missing_labels)} 个标签在邮件模板中不存在，将被忽略: {details}\n"
+
+    def label_ids(self, matched_columns):
+        """按匹配列顺序展开标签编号，已出现的标签跳过"""
+        ids = []
+        seen = 0
         for column in matched_columns:
-            if column not in EMAIL_MAPPING:
+            bits = self.column_bits.get(column, 0)
+            if not bits & ~seen:
                 continue
+            for label_id in self.column_labels[column]:
+                if not seen >> label_id & 1:
+                    ids.append(label_id)
+            seen |= bits
+        return ids
 
-            labels = [label.strip() for label in EMAIL_MAPPING[column].split(',')]
-            all_labels.extend(labels)
+    def versions(self, matched_columns):
+        """匹配列对应的 {标签: 模板内容摘要}，按合并顺序排列"""
+        return {self.labels[label_id]: self.digests[label_id] for label_id in self.label_ids(matched_columns)}
 
-        seen = set()
-        unique_labels = []
-        for label in all_labels:
-            if label not in seen:
-                seen.add(label)
-                unique_labels.append(label)
+    def digest(self, label):
+        """标签当前的模板内容摘要；模板中不存在或未被映射时返回 None"""
+        label_id = self.label_index.get(label)
+        return None if label_id is None else self.digests[label_id]
 
+    def merge(self, matched_columns):
+        """合并匹配列对应的邮件内容，返回 (英文文本列表, 英文样式列表, 中文文本列表, 中文样式列表)"""
         english_text_parts = []
         english_style_parts = []
         chinese_text_parts = []
         chinese_style_parts = []
 
-        for label in unique_labels:
-            if label in email_templates:
-                data = email_templates[label]
+        for label_id in self.label_ids(matched_columns):
+            english_text, english_styles, chinese_text, chinese_styles = self.templates[label_id]
+
+            if english_text:
+                english_text_parts.append(english_text)
+                english_style_parts.append(english_styles)
 
-                if data['english_text']:
-                    english_text_parts.append(data['english_text'])
-                    english_style_parts.append(data['english_styles'])
+            if chinese_text:
+                chinese_text_parts.append(chinese_text)
+                chinese_style_parts.append(chinese_styles)
 
-                if data['chinese_text']:
-                    chinese_text_parts.append(data['chinese_text'])
-                    chinese_style_parts.append(data['chinese_styles'])
+        return english_text_parts, english_style_parts, chinese_text_parts, chinese_style_parts
+
+
+class EmailContentExtractor:
+    @staticmethod
+    def extract_and_merge_content(matched_columns, email_templates, label_table=None):
+        """根据匹配列名提取并合并邮件内容（包含样式信息）
 
-        return english_text_parts, english_style_parts, chinese_text_parts, chinese_style_parts
\ No newline at end of file
+        label_table 为预先构建的 LabelTable；未提供时按本次的匹配列临时构建。
+        """
+        if label_table is None:
+            label_table = LabelTable(matched_columns, email_templates)
+        return label_table.merge(matched_columns)
@@ -1,13 +1,28 @@
 # src/core/formatter.py
+import os
+import threading
+from copy import deepcopy
 from docx import Document
+from docx.oxml import OxmlElement, parse_xml
 from docx.shared import RGBColor
+from docx.text.paragraph import Paragraph
+from lxml import etree
+from .style_runs import STYLE_NAMES
 from config.settings import GREETINGS, CLOSINGS, SIGNATURE
 
 
 class WordFormatter:
-    def __init__(self, file_name):
+    # 正文元素跨进程传递需在主进程逐块重新解析，代价高于主进程直接渲染，因此不在工作进程中渲染：
+    # 多进程批处理改为在当前进程内处理
+    RENDER_IN_WORKERS = False
+
+    def __init__(self, file_name, fragment_cache=None):
+        """fragment_cache: 可选的 LRUCache，缓存每种内容组合已渲染好的正文片段"""
         self.word_doc = Document()
         self.file_name = file_name
+        self.fragment_cache = fragment_cache
+        # 节属性始终位于正文末尾，记下它以便常数时间插入（lxml 中 len(body) 需要遍历全部子元素）
+        self._sect_pr = self.word_doc.element.body.sectPr
 
 
     @staticmethod
@@ -22,66 +37,116 @@ class WordFormatter:
             run.bold = True
         # normal 样式无需特殊处理
 
+    def _new_paragraph(self, text=None):
+        """在正文末尾新建段落；等同于 Document.add_paragraph，但不在每次插入时查找节属性，大文档下仍为常数开销"""
+        p = OxmlElement('w:p')
+        self._insert_body_element(p)
+        paragraph = Paragraph(p, self.word_doc._body)
+        if text:
+            paragraph.add_run(text)
+        return paragraph
+
     def add_paragraph(self, content=None, before_black=0, after_black=0):
         for i in range(before_black):
-            self.word_doc.add_paragraph()
+            self._new_paragraph()
 
         if content:
-            self.word_doc.add_paragraph(content)
+            self._new_paragraph(content)
 
         for i in range(after_black):
-            self.word_doc.add_paragraph()
-
-    def format_and_save_word(self, text_parts, style_parts, code, language):
-        """格式化内容并保存为 Word 文档"""
+            self._new_paragraph()
+
+    def begin_code(self, code):
+        """写入单个编码的标题段落"""
+        self.add_paragraph(f"编码:{code} 模板如下：", before_black=1, after_black=1)
+
+    def body_length(self):
+        """当前文档正文中的元素数量（不含节属性）"""
+        return len(self.word_doc.element.body) - (1 if self._sect_pr is not None else 0)
+
+    def document_stats(self):
+        """文档规模统计：正文元素数量，以及已保存文件的字节数"""
+        file_bytes = None
+        if self.file_name and isinstance(self.file_name, str) and os.path.exists(self.file_name):
+            file_bytes = os.path.getsize(self.file_name)
+        return {'body_elements': self.body_length(), 'file_bytes': file_bytes}
+
+    def body_elements(self, start=0):
+        """正文中从 start 开始的元素（不含节属性）"""
+        body = self.word_doc.element.body
+        return body[start:self.body_length()]
+
+    def _insert_body_element(self, element):
+        """在正文末尾（节属性之前）插入元素"""
+        if self._sect_pr is not None:
+            self._sect_pr.addprevious(element)
+        else:
+            self.word_doc.element.body.append(element)
+
+    def export_body_xml(self, start=0):
+        """将正文中从 start 开始的元素序列化为 XML 片段，供其他进程中的文档拼接"""
+        return [etree.tostring(element) for element in self.body_elements(start)]
+
+    def append_code_xml(self, code, fragments):
+        """按顺序把其他文档导出的 XML 片段插入正文末尾（节属性之前）"""
+        for fragment in fragments:
+            self._insert_body_element(parse_xml(fragment))
+
+    def format_and_save_word(self, text_parts, style_parts, code, language, fragment_cache=None):
+        """格式化内容并保存为 Word 文档；相同语言与内容组合只渲染一次，之后复制已渲染的片段
+
+        fragment_cache 指定本次使用的片段缓存（如处理器当前数据快照的缓存），未提供时使用构造时传入的缓存。
+        缓存的片段是 lxml 元素树，lxml 不保证多线程同时读取同一棵树是安全的，因此按线程分别缓存
+        （流水线渲染线程、服务的请求线程共用同一个缓存时各自复制自己的片段）。
+        """
+        fragment_cache = fragment_cache if fragment_cache is not None else self.fragment_cache
+        if fragment_cache is None:
+            self._build_email(text_parts, style_parts, language)
+            return
+
+        # 模板文本对象来自同一份模板字典，字符串哈希已缓存，以其组合作为键开销很小
+        key = (language, tuple(text_parts), threading.get_ident())
+        fragment = fragment_cache.get(key)
+        if fragment is None:
+            start = self.body_length()
+            self._build_email(text_parts, style_parts, language)
+            fragment_cache.put(key, [deepcopy(element) for element in self.body_elements(start)])
+            return
+
+        for element in fragment:
+            self._insert_body_element(deepcopy(element))
+
+    def _build_email(self, text_parts, style_parts, language):
+        """逐段、逐 run 构建一封邮件的正文（问候语、各问题及结束语）"""
         greeting = GREETINGS.get(language, "Hello Seller,")
         closing = CLOSINGS.get(language, "If you have any questions, please contact us in time. Thanks！")
 
-        self.word_doc.add_paragraph(greeting)
-        self.word_doc.add_paragraph()
+        self._new_paragraph(greeting)
+        self._new_paragraph()
 
         for i, (text, styles) in enumerate(zip(text_parts, style_parts)):
             if i > 0:
-                self.word_doc.add_paragraph()
+                self._new_paragraph()
 
             question_title = f"Question {i + 1}:" if language == 'EN' else f"问题 {i + 1}:"
-            title_para = self.word_doc.add_paragraph()
+            title_para = self._new_paragraph()
             title_para.add_run(question_title)
 
-            content_para = self.word_doc.add_paragraph()
-            full_text = text
+            content_para = self._new_paragraph()
 
             if not styles:
-                content_para.add_run(full_text)
+                content_para.add_run(text)
             else:
-                last_end_idx = 0
-                for part_text, part_style in styles:
-                    start_idx = full_text.find(part_text, last_end_idx)
-                    if start_idx == -1:
-                        run = content_para.add_run(part_text)
-                        WordFormatter._apply_word_style(run, 'normal')
-                        continue
-
-                    if start_idx > last_end_idx:
-                        prefix = full_text[last_end_idx:start_idx]
-                        run = content_para.add_run(prefix)
-                        WordFormatter._apply_word_style(run, 'normal')
-
-                    styled_run = content_para.add_run(part_text)
-                    WordFormatter._apply_word_style(styled_run, part_style)
-
-                    last_end_idx = start_idx + len(part_text)
-
-                if last_end_idx < len(full_text):
-                    suffix = full_text[last_end_idx:]
-                    run = content_para.add_run(suffix)
-                    WordFormatter._apply_word_style(run, 'normal')
+                # styles 为加载模板时预先算好的 StyleRun，按偏移切片即可，无需在全文中查找
+                for style_run in styles:
+                    run = content_para.add_run(text[style_run.start:style_run.end])
+                    WordFormatter._apply_word_style(run, STYLE_NAMES[style_run.style])
 
-        self.word_doc.add_paragraph()
-        self.word_doc.add_paragraph(closing)
+        self._new_paragraph()
+        self._new_paragraph(closing)
 
 
     def save(self):
-        self.word_doc.add_paragraph()
-        self.word_doc.add_paragraph(SIGNATURE)
+        self._new_paragraph()
+        self._new_paragraph(SIGNATURE)
         self.word_doc.save(self.file_name)
@@ -0,0 +1,183 @@
+# src/core/hts_index.py
+import re
+from bisect import bisect_left
+from decimal import Decimal, InvalidOperation
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_ZERO_DECIMAL = re.compile(r'\.0*$')
+_EXPONENT = re.compile(r'[eE][-+]?[0-9]+')
+_SCIENTIFIC = re.compile(r'^\d+(\.\d*)?[eE][-+]?\d+$')
+_DIGITS = re.compile(r'^\d+$')
+
+
+def normalize_code(value):
+    """将单个单元格值规范化为纯数字编码；无效时返回 None
+
+    去除空白与 Excel 浮点数留下的 '.0' 尾巴；科学计数法（如 '8.4713E+09'）按数值展开为整数，
+    不是整数的值视为无效。
+    """
+    if value is None:
+        return None
+    code = _WHITESPACE.sub('', str(value).strip())
+    if _SCIENTIFIC.search(code):
+        try:
+            number = Decimal(code)
+        except InvalidOperation:
+            return None
+        return str(int(number)) if number == number.to_integral_value() else None
+    code = _EXPONENT.sub('', _TRAILING_ZERO_DECIMAL.sub('', code))
+    return code if code and _DIGITS.search(code) else None
+
+
+def normalize_code_series(column_data):
+    """将 DataFrame 的一列规范化为有效的纯数字编码，逐个单元格按 normalize_code 处理"""
+    return column_data.map(normalize_code, na_action='ignore').dropna()
+
+
+class HTSPrefixIndex:
+    """HTS 编码层级索引：一次构建，查询代价只与输入编码长度有关
+
+    DB 中每个编码都预先算好“累计掩码”，即它自身及所有作为其前缀的上级 DB 编码所属列的并集；
+    输入编码的匹配列就是其最长 DB 前缀的累计掩码，无需逐级合并。
+    """
+
+    def __init__(self, columns, entries):
+        """
+        columns: 列名列表（保持 HTS DB 中的顺序）
+        entries: 可迭代的 (规范化编码, 列序号) 对
+        """
+        self.columns = list(columns)
+        self.entry_count = 0
+        # 完整编码 -> 该编码自身的列掩码，以及 DB 中出现过的编码长度（升序）
+        self.code_masks = {}
+        self.code_lengths = ()
+        # 完整编码 -> 累计掩码（含所有上级 DB 编码）
+        self.ancestor_masks = {}
+
+        for code, column_pos in entries:
+            self.code_masks[code] = self.code_masks.get(code, 0) | 1 << column_pos
+            self.entry_count += 1
+
+        self.code_lengths = tuple(sorted({len(code) for code in self.code_masks}))
+        # 全部 DB 编码按字符串排序，同一前缀的编码连续排列，供输入联想二分查找
+        self.sorted_codes = sorted(self.code_masks)
+        # 按长度从短到长处理，上级编码的累计掩码总是先于下级算好
+        for code in sorted(self.code_masks, key=len):
+            mask = self.code_masks[code]
+            for length in self.code_lengths:
+                if length >= len(code):
+                    break
+                mask |= self.ancestor_masks.get(code[:length], 0)
+            self.ancestor_masks[code] = mask
+
+        # search_plans[n]：长度为 n 的输入编码从长到短要检查的前缀位数（只含 DB 中出现过的编码长度）
+        max_length = max(self.code_lengths, default=0)
+        self.search_plans = [
+            tuple(length for length in reversed(self.code_lengths) if length <= n)
+            for n in range(max_length + 1)
+        ]
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """从 HTSDataLoader 读取的 DataFrame 构建索引"""
+        entries = []
+        for column_pos, column_name in enumerate(df.columns):
+            for code in normalize_code_series(df[column_name]):
+                entries.append((code, column_pos))
+        return cls(df.columns, entries)
+
+    @classmethod
+    def from_source(cls, hts_data):
+        """接受已构建的索引或 DataFrame，统一返回索引"""
+        if isinstance(hts_data, cls):
+            return hts_data
+        return cls.from_dataframe(hts_data)
+
+    def lookup_mask(self, input_code):
+        """返回输入编码所有 DB 前缀的列掩码并集，即其最长 DB 前缀的累计掩码
+
+        上级编码的结果已预先并入累计掩码，从长到短找到的第一个 DB 前缀即为答案，无需再查其上级。
+        """
+        ancestor_masks = self.ancestor_masks
+        for length in self.search_plans[min(len(input_code), len(self.search_plans) - 1)]:
+            mask = ancestor_masks.get(input_code[:length])
+            if mask is not None:
+                return mask
+        return 0
+
+    def suggest(self, prefix, limit):
+        """输入联想：二分查找以 prefix 开头的 DB 编码，返回 (按字符串顺序的前 limit 个编码, 候选总数)"""
+        codes = self.sorted_codes
+        start = bisect_left(codes, prefix)
+        # 编码只含数字，':' 排在 '9' 之后，prefix + ':' 即为该前缀区间的上界
+        end = bisect_left(codes, prefix + ':', start)
+        return codes[start:min(end, start + limit)], end - start
+
+    def match_sources(self, input_code):
+        """匹配审计：返回 [(列名, DB 编码, 编码位数), ...]，说明每个匹配列由哪一级 DB 编码带来
+
+        按层级从高到低、同一层级内按 DB 列顺序排列；同一列被多级编码命中时逐条列出。
+        """
+        sources = []
+        for length in self.code_lengths:
+            if length > len(input_code):
+                break
+            entry = input_code[:length]
+            mask = self.code_masks.get(entry)
+            if mask:
+                sources.extend((column, entry, length) for column in self.columns_from_mask(mask))
+        return sources
+
+    def columns_from_mask(self, mask):
+        """按 DB 列顺序展开列掩码"""
+        return [column for pos, column in enumerate(self.columns) if mask >> pos & 1]
+
+    def lookup(self, input_code):
+        """返回与输入编码匹配的列名列表（按 DB 列顺序）"""
+        return self.columns_from_mask(self.lookup_mask(input_code))
+
+    def lookup_many(self, codes):
+        """批量匹配：返回每个编码的匹配列元组（按 DB 列顺序），顺序与输入一致
+
+        一批编码通常只对应少数几种列组合，每种列掩码只展开一次，相同组合共用同一个元组。
+        """
+        lookup_mask = self.lookup_mask
+        columns_of = {}
+        results = []
+        for code in codes:
+            mask = lookup_mask(code)
+            columns = columns_of.get(mask)
+            if columns is None:
+                columns = columns_of[mask] = tuple(self.columns_from_mask(mask))
+            results.append(columns)
+        return results
+
+    def match_many(self, codes):
+        """批量匹配：返回 (编码数 x 列数) 的 NumPy 布尔矩阵，行顺序与输入一致
+
+        先求出每个编码的累计掩码，按掩码去重后只展开不同的列组合，再按行索引取出整个矩阵。
+        """
+        import numpy as np
+
+        row_of = {}
+        unique_masks = []
+        rows = []
+        lookup_mask = self.lookup_mask
+        for code in codes:
+            mask = lookup_mask(code)
+            row = row_of.get(mask)
+            if row is None:
+                row = row_of[mask] = len(unique_masks)
+                unique_masks.append(mask)
+            rows.append(row)
+
+        column_count = len(self.columns)
+        unique_matrix = np.zeros((len(unique_masks), column_count), dtype=bool)
+        # 按 64 位一组展开列掩码，列数超过 64 时逐组处理
+        for word_start in range(0, column_count, 64):
+            word_width = min(64, column_count - word_start)
+            words = np.fromiter(((mask >> word_start) & 0xFFFFFFFFFFFFFFFF for mask in unique_masks),
+                                dtype=np.uint64, count=len(unique_masks))
+            shifts = np.arange(word_width, dtype=np.uint64)
+            unique_matrix[:, word_start:word_start + word_width] = (words[:, None] >> shifts) & np.uint64(1)
+        return unique_matrix[np.asarray(rows, dtype=np.intp)]
@@ -0,0 +1,104 @@
+# src/core/incremental.py
+import json
+
+
+def load_previous_results(file_name):
+    """读取上次运行的 JSONL 结果文件，按原顺序返回记录列表"""
+    records = []
+    with open(file_name, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"结果文件第 {line_number} 行不是有效的 JSON: {e}")
+            if not isinstance(record, dict) or 'code' not in record:
+                raise ValueError(f"结果文件第 {line_number} 行缺少 code 字段")
+            records.append(record)
+    return records
+
+
+def diff_previous_results(processor, records):
+    """对比上次的结果与当前数据快照，找出需要重新生成的编码
+
+    编码按当前 DB 重新匹配（批量匹配，代价远低于生成文档），匹配列集合变化、所用标签变化，
+    或所用标签的模板内容摘要（template_versions）变化时需要重新生成；上次结果没有 template_versions 时
+    无法判断模板是否变化，有匹配列的编码一律重新生成。
+    返回 (需重新生成的编码列表（去重并保持顺序）, 变更报告字典)。
+    """
+    snapshot = processor.snapshot
+    label_table = snapshot.label_table
+    matches = processor.match_codes([record['code'] for record in records], snapshot)
+
+    changed_codes = []
+    code_changes = []
+    column_deltas = {}
+    previous_digests = {}
+    checked = set()
+    for record, (code, matched_columns) in zip(records, matches):
+        previous_versions = record.get('template_versions')
+        if previous_versions is not None:
+            for label, digest in previous_versions.items():
+                previous_digests.setdefault(label, digest)
+        if code in checked:
+            continue
+        checked.add(code)
+
+        previous_columns = tuple(record.get('matched_columns') or ())
+        versions = label_table.versions(matched_columns)
+        reasons = []
+        changed_labels = []
+        if previous_columns != matched_columns:
+            reasons.append('columns')
+            for column in matched_columns:
+                if column not in previous_columns:
+                    column_deltas.setdefault(column, {'gained': 0, 'lost': 0})['gained'] += 1
+            for column in previous_columns:
+                if column not in matched_columns:
+                    column_deltas.setdefault(column, {'gained': 0, 'lost': 0})['lost'] += 1
+        if previous_versions is None:
+            if matched_columns:
+                reasons.append('unversioned')
+        else:
+            changed_labels = [label for label, digest in versions.items()
+                              if label in previous_versions and previous_versions[label] != digest]
+            if changed_labels:
+                reasons.append('templates')
+            elif not reasons and list(previous_versions) != list(versions):
+                reasons.append('labels')
+        if reasons:
+            changed_codes.append(code)
+            code_changes.append({'code': code, 'reasons': reasons, 'previous_columns': list(previous_columns),
+                                 'matched_columns': list(matched_columns), 'changed_labels': changed_labels})
+
+    report = {
+        'previous_codes': len(checked),
+        'regenerated': len(changed_codes),
+        'unchanged': len(checked) - len(changed_codes),
+        'column_deltas': column_deltas,
+        'templates': {
+            'changed': [label for label, digest in previous_digests.items()
+                        if label_table.digest(label) not in (None, digest)],
+            'removed': [label for label in previous_digests if label_table.digest(label) is None]
+        },
+        'codes': code_changes
+    }
+    return changed_codes, report
+
+
+def format_change_report(report):
+    """变更报告的简要说明（多行文本）"""
+    lines = [f"增量更新: 上次 {report['previous_codes']} 个编码，需重新生成 {report['regenerated']} 个，"
+             f"未变化 {report['unchanged']} 个"]
+    for column, delta in report['column_deltas'].items():
+        lines.append(f"  列 {column}: 新增匹配 {delta['gained']} 个编码，不再匹配 {delta['lost']} 个编码")
+    if report['templates']['changed']:
+        lines.append(f"  模板内容变化: {'、'.join(report['templates']['changed'])}")
+    if report['templates']['removed']:
+        lines.append(f"  模板中已不存在: {'、'.join(report['templates']['removed'])}")
+    unversioned = sum(1 for change in report['codes'] if 'unversioned' in change['reasons'])
+    if unversioned:
+        lines.append(f"  上次结果缺少模板版本信息，{unversioned} 个有匹配的编码按变化处理")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,162 @@
+# src/core/instrumentation.py
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+@contextmanager
+def stage_timer(stage_times, stage):
+    """将代码块耗时（秒）累加到 stage_times[stage]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_times[stage] = stage_times.get(stage, 0.0) + time.perf_counter() - start
+
+
+class BatchMetrics:
+    """批处理的结构化统计：分阶段耗时、吞吐量、匹配列数与缓存命中，通过 event_func 以字典事件输出
+
+    事件类型:
+        code_done   每个编码处理完成（stages 为各阶段耗时，单位秒）
+        progress    进度与吞吐量，按 progress_interval 节流，最后一个编码必定发送
+        batch_done  整批完成的汇总（cancelled 为 True 表示中途取消，codes 为实际处理的编码数）
+
+    流水线模式下 progress 事件的 queues 为各阶段队列的当前深度，batch_done 的 pipeline 为各阶段统计。
+    """
+
+    def __init__(self, total, event_func=None, progress_interval=0.25, keep_records=False):
+        """keep_records=True 时保留每个编码的统计记录（工作进程用于回传给主进程）"""
+        self.total = total
+        self.event_func = event_func
+        self.progress_interval = progress_interval
+        self.start = time.perf_counter()
+        self.done = 0
+        self.matched_codes = 0
+        self.matched_columns = 0
+        self.cache_hits = 0
+        self.stage_totals = defaultdict(float)
+        self.records = [] if keep_records else None
+        self.cancelled = False
+        # 返回各队列深度的函数（流水线模式），progress 事件中一并报告
+        self.queue_depths = None
+        self._last_progress = 0.0
+
+    def emit(self, event):
+        if self.event_func is not None:
+            self.event_func(event)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def codes_per_sec(self):
+        elapsed = self.elapsed()
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def record_code(self, code, stage_times, matched_count, cache_hits):
+        """记录一个编码的处理结果，并发送 code_done 与（节流后的）progress 事件"""
+        self.done += 1
+        self.matched_columns += matched_count
+        self.matched_codes += 1 if matched_count else 0
+        self.cache_hits += cache_hits
+        for stage, seconds in stage_times.items():
+            self.stage_totals[stage] += seconds
+        if self.records is not None:
+            self.records.append((code, stage_times, matched_count, cache_hits))
+
+        if self.event_func is None:
+            return
+        self.emit({
+            'event': 'code_done',
+            'code': code,
+            'index': self.done,
+            'total': self.total,
+            'matched_columns': matched_count,
+            'cache_hits': cache_hits,
+            'stages': dict(stage_times),
+            'seconds': sum(stage_times.values())
+        })
+        now = time.perf_counter()
+        if self.done == self.total or now - self._last_progress >= self.progress_interval:
+            self._last_progress = now
+            self.emit(self.progress_event())
+
+    def progress_event(self):
+        rate = self.codes_per_sec()
+        remaining = max(self.total - self.done, 0)
+        return {
+            'event': 'progress',
+            'done': self.done,
+            'total': self.total,
+            'elapsed': self.elapsed(),
+            'codes_per_sec': rate,
+            'eta': remaining / rate if rate > 0 else None,
+            'queues': self.queue_depths() if self.queue_depths is not None else None
+        }
+
+    def finish(self, cache_stats=None, document=None, pipeline=None):
+        """发送并返回整批汇总事件"""
+        event = {
+            'event': 'batch_done',
+            'codes': self.done,
+            'matched_codes': self.matched_codes,
+            'matched_columns': self.matched_columns,
+            'cache_hits': self.cache_hits,
+            'elapsed': self.elapsed(),
+            'codes_per_sec': self.codes_per_sec(),
+            'stages': dict(self.stage_totals),
+            'cache': cache_stats,
+            'document': document,
+            'cancelled': self.cancelled,
+            'pipeline': pipeline
+        }
+        self.emit(event)
+        return event
+
+
+@contextmanager
+def profiling(mode, event_func=None, output_dir='.'):
+    """可选的性能剖析：mode 为 'cprofile' 时保存 .prof 文件，为 'tracemalloc' 时统计内存分配热点"""
+    if not mode:
+        yield
+        return
+
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = os.path.join(output_dir, f"HTS_profile_{stamp}.prof")
+            profiler.dump_stats(path)
+            stats = pstats.Stats(profiler)
+            top = [
+                {'function': f"{os.path.basename(func[0])}:{func[1]}({func[2]})", 'calls': values[1],
+                 'cumulative': values[3]}
+                for func, values in sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:15]
+            ]
+            if event_func is not None:
+                event_func({'event': 'profile', 'mode': mode, 'path': path, 'top': top})
+    elif mode == 'tracemalloc':
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if not already_tracing:
+                tracemalloc.stop()
+            top = [{'location': str(stat.traceback), 'size_kb': stat.size / 1024, 'count': stat.count}
+                   for stat in snapshot.statistics('lineno')[:15]]
+            if event_func is not None:
+                event_func({'event': 'profile', 'mode': mode, 'peak_kb': peak / 1024, 'top': top})
+    else:
+        raise ValueError(f"未知的性能剖析模式: {mode}")
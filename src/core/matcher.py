@@ -1,33 +1,43 @@
 # src/core/matcher.py
-import pandas as pd
+from .hts_index import HTSPrefixIndex
 
 
 class HTSMatcher:
+    def __init__(self, hts_data=None):
+        """hts_data 为 DataFrame 或已构建的 HTSPrefixIndex；提供时在构造时一次性建立前缀索引"""
+        self.hts_data = hts_data
+        self.index = HTSPrefixIndex.from_source(hts_data) if hts_data is not None else None
+
     @staticmethod
     def find_matching_columns(input_code, df):
-        """根据输入的编码和 DataFrame，找出匹配的列标题"""
-        matching_columns = []
-        for column_name in df.columns:
-            column_data = df[column_name]
-            valid_codes = (
-                column_data
-                .fillna('')
-                .astype(str)
-                .str.strip()
-                .str.replace(r'\s+', '', regex=True)
-                .str.replace(r'\.0*$', '', regex=True)
-                .str.replace(r'[eE][-+]?[0-9]+', '', regex=True)
-                .loc[lambda x: x != '']
-                .loc[lambda x: x.str.contains(r'^\d+$')]
-            )
-
-            matched = False
-            for code in valid_codes:
-                if len(code) <= len(input_code) and input_code.startswith(code):
-                    matched = True
-                    break
-
-            if matched:
-                matching_columns.append(column_name)
-
-        return matching_columns
+        """根据输入的编码和 DataFrame（或已构建的 HTSPrefixIndex），找出匹配的列标题
+
+        每次调用都为 df 临时构建索引；同一份数据反复匹配时，请构造 HTSMatcher(df) 后调用 lookup。
+        """
+        return HTSPrefixIndex.from_source(df).lookup(input_code)
+
+    def lookup(self, input_code):
+        """使用构造时建立的前缀索引，找出输入编码匹配的列标题（按 DB 列顺序）"""
+        return self._require_index().lookup(input_code)
+
+    def match_sources(self, input_code):
+        """匹配审计：返回 [(列名, DB 编码, 编码位数), ...]，说明每个匹配列由哪一级 DB 编码带来"""
+        return self._require_index().match_sources(input_code)
+
+    def lookup_many(self, codes):
+        """批量匹配多个编码，返回每个编码的匹配列元组（按 DB 列顺序）"""
+        return self._require_index().lookup_many(codes)
+
+    def match_many(self, codes):
+        """批量匹配多个编码，返回 (编码数 x 列数) 的布尔矩阵，列顺序同 self.index.columns"""
+        return self._require_index().match_many(codes)
+
+    def columns_for_matrix(self, matrix):
+        """将 match_many 的布尔矩阵逐行展开为匹配列名列表"""
+        columns = self._require_index().columns
+        return [[columns[pos] for pos in row.nonzero()[0]] for row in matrix]
+
+    def _require_index(self):
+        if self.index is None:
+            raise ValueError("HTSMatcher 未提供 HTS 数据：请在构造时传入 hts_data")
+        return self.index
@@ -0,0 +1,187 @@
+# src/core/output_sinks.py
+import html
+import json
+import os
+import re
+from email.header import Header
+from email.message import EmailMessage
+from .style_runs import STYLE_NORMAL, STYLE_RED, STYLE_BOLD, STYLE_REDBOLD
+from ..utils.lru_cache import LRUCache
+from config.settings import GREETINGS, CLOSINGS, SIGNATURE, FRAGMENT_CACHE_SIZE
+
+# 样式 -> HTML 起止标签（与 Word 中的红色 / 加粗 / 红色加粗一致）
+_HTML_STYLE_TAGS = {
+    STYLE_NORMAL: ('', ''),
+    STYLE_RED: ('<span style="color:#FF0000">', '</span>'),
+    STYLE_BOLD: ('<b>', '</b>'),
+    STYLE_REDBOLD: ('<b style="color:#FF0000">', '</b>'),
+}
+_LINE_BREAKS = re.compile(r'\r\n|[\r\n]')
+_UNSAFE_FILE_CHARS = re.compile(r'[^\w.-]')
+_EMPTY_PARAGRAPH = '<p><br></p>'
+_HTML_HEAD = ('<!DOCTYPE html>\n<html lang="zh-CN">\n<head>\n<meta charset="utf-8">\n<title>{title}</title>\n'
+              '<style>p {{ margin: 0; white-space: pre-wrap; }}</style>\n</head>\n<body>\n')
+_HTML_TAIL = '</body>\n</html>\n'
+
+
+def _html_text(text):
+    return _LINE_BREAKS.sub('<br>', html.escape(text, quote=False))
+
+
+def email_html(text_parts, style_parts, language):
+    """生成一封邮件的 HTML 段落，结构同 Word 中的邮件（问候语、各问题、结束语及签名），保留红色与加粗"""
+    greeting = GREETINGS.get(language, "Hello Seller,")
+    closing = CLOSINGS.get(language, "If you have any questions, please contact us in time. Thanks！")
+
+    paragraphs = [f'<p>{_html_text(greeting)}</p>', _EMPTY_PARAGRAPH]
+    for i, (text, styles) in enumerate(zip(text_parts, style_parts)):
+        if i > 0:
+            paragraphs.append(_EMPTY_PARAGRAPH)
+
+        question_title = f"Question {i + 1}:" if language == 'EN' else f"问题 {i + 1}:"
+        paragraphs.append(f'<p>{question_title}</p>')
+
+        if not styles:
+            runs = _html_text(text)
+        else:
+            runs = ''.join(_HTML_STYLE_TAGS[style_run.style][0] + _html_text(text[style_run.start:style_run.end])
+                           + _HTML_STYLE_TAGS[style_run.style][1] for style_run in styles)
+        paragraphs.append(f'<p>{runs}</p>' if runs else _EMPTY_PARAGRAPH)
+
+    paragraphs.append(_EMPTY_PARAGRAPH)
+    paragraphs.append(f'<p>{_html_text(closing)}</p>')
+    paragraphs.append(f'<p>{_html_text(SIGNATURE)}</p>')
+    return '\n'.join(paragraphs)
+
+
+def email_languages(result, content):
+    """按 Word 文档的顺序（先英文后中文）列出有内容的语言：[(语言, 文本列表, 样式列表, 显示文本), ...]"""
+    if content is None:
+        return []
+    en_text_parts, en_style_parts, ch_text_parts, ch_style_parts = content
+    languages = []
+    if en_text_parts:
+        languages.append(('EN', en_text_parts, en_style_parts, result['en_content']))
+    if ch_text_parts:
+        languages.append(('CH', ch_text_parts, ch_style_parts, result['ch_content']))
+    return languages
+
+
+class JsonlSink:
+    """每个编码写一行 JSON 结果（含无匹配的编码）；extra_func(result) 可返回附加字段"""
+
+    def __init__(self, file_name, extra_func=None):
+        self.file_name = file_name
+        self.extra_func = extra_func
+        self.file = open(file_name, 'w', encoding='utf-8')
+
+    def write(self, result, content):
+        if self.extra_func is not None:
+            result = dict(result, **self.extra_func(result))
+        self.file.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class TextSink:
+    """纯文本：所有编码写入一个 UTF-8 文件，每个编码依次为标题、英文邮件、中文邮件"""
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.file = open(file_name, 'w', encoding='utf-8')
+
+    def write(self, result, content):
+        languages = email_languages(result, content)
+        if not languages:
+            return
+        self.file.write(f"编码:{result['code']} 模板如下：\n\n")
+        for language, text_parts, style_parts, display in languages:
+            self.file.write(display + '\n\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class HtmlSink:
+    """HTML：所有编码写入一个页面，保留模板中的红色与加粗"""
+
+    def __init__(self, file_name, title="HTS Email"):
+        self.file_name = file_name
+        self.file = open(file_name, 'w', encoding='utf-8')
+        self.file.write(_HTML_HEAD.format(title=html.escape(title)))
+
+    def write(self, result, content):
+        languages = email_languages(result, content)
+        if not languages:
+            return
+        code = html.escape(result['code'])
+        self.file.write(f'<section id="code-{code}">\n<h2>编码:{code} 模板如下：</h2>\n')
+        for language, text_parts, style_parts, display in languages:
+            lang = 'en' if language == 'EN' else 'zh'
+            self.file.write(f'<div lang="{lang}">\n{email_html(text_parts, style_parts, language)}\n</div>\n'
+                            f'{_EMPTY_PARAGRAPH}\n')
+        self.file.write('</section>\n<hr>\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.write(_HTML_TAIL)
+        self.file.close()
+
+
+class EmlSink:
+    """.eml：每个有邮件内容的编码在 directory 下生成一个 {编码}.eml 草稿（纯文本与 HTML 两种正文）
+
+    邮件正文只取决于内容组合，编码好的 MIME 正文按内容组合缓存，每个编码只需另写 Subject 头。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.files = []
+        self.body_cache = LRUCache(FRAGMENT_CACHE_SIZE)
+
+    @staticmethod
+    def _build_body(languages):
+        """生成不含 Subject 的邮件（其余邮件头与 multipart/alternative 正文）的字节"""
+        message = EmailMessage()
+        # Outlook 以草稿方式打开，填写收件人后即可发送
+        message['X-Unsent'] = '1'
+        message.set_content('\n\n'.join(display for _, _, _, display in languages))
+        body = f'\n{_EMPTY_PARAGRAPH}\n'.join(email_html(text_parts, style_parts, language)
+                                             for language, text_parts, style_parts, _ in languages)
+        message.add_alternative(_HTML_HEAD.format(title="HTS Email") + body + '\n' + _HTML_TAIL, subtype='html')
+        return bytes(message)
+
+    def write(self, result, content):
+        languages = email_languages(result, content)
+        if not languages:
+            return
+        key = tuple((language, tuple(text_parts)) for language, text_parts, _, _ in languages)
+        body = self.body_cache.get(key)
+        if body is None:
+            body = self._build_body(languages)
+            self.body_cache.put(key, body)
+
+        subject = f"HTS {result['code']}"
+        if not subject.isascii():
+            subject = Header(subject, 'utf-8').encode()
+        file_name = os.path.join(self.directory, _UNSAFE_FILE_CHARS.sub('_', result['code']) + '.eml')
+        with open(file_name, 'wb') as f:
+            f.write(f"Subject: {subject}\n".encode('ascii'))
+            f.write(body)
+        self.files.append(file_name)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
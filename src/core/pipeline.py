@@ -0,0 +1,202 @@
+# src/core/pipeline.py
+import queue
+import threading
+import time
+
+# 阶段结束标记：上游阶段全部工作线程完成后，为下游每个工作线程放入一个
+_DONE = object()
+# 阻塞在队列上的线程每隔该秒数检查一次是否需要停止
+_POLL_SECONDS = 0.1
+
+
+class PipelineStopped(Exception):
+    """流水线被停止（取消、出错或调用方提前结束）时，阻塞中的工作线程以此退出"""
+
+
+class CodeJob:
+    """流水线中的一个编码：各阶段依次填入匹配结果、合并内容与正文片段，日志先收集，写出时按顺序输出"""
+
+    __slots__ = ('seq', 'code', 'matched_columns', 'result', 'content', 'fragments', 'messages', 'stage_times')
+
+    def __init__(self, seq, code):
+        self.seq = seq
+        self.code = code
+        self.matched_columns = None
+        self.result = None
+        self.content = None
+        self.fragments = None
+        self.messages = []
+        self.stage_times = {}
+
+
+class StagedPipeline:
+    """匹配 → 合并 → 渲染 → 写出 四阶段流水线，阶段之间以有界队列连接
+
+    编码按 batch_size 分批在阶段间传递（每批一次入队 / 出队，减少线程切换）。匹配、合并、渲染阶段
+    各由若干工作线程执行，写出阶段在调用方线程中进行：各批带输入序号，写出前经重排缓冲区恢复输入顺序，
+    文档与结果的顺序与串行处理一致。队列满时上游线程等待（背压），在途编码数不超过
+    (各队列容量之和 + 工作线程数) x batch_size。各队列的当前深度（批数）由 depths() 提供，
+    各阶段的忙碌、等待输入（idle）与等待下游（blocked）时间及队列峰值由 stats() 汇总：
+    idle 高说明上游是瓶颈，blocked 高说明下游是瓶颈，据此调整各阶段线程数与队列容量。
+    """
+
+    STAGES = ('match', 'merge', 'render')
+
+    def __init__(self, workers, queue_size, batch_size):
+        """workers: {'match': n, 'merge': n, 'render': n}；queue_size: 每个队列的容量（批数）；
+        batch_size: 每批的编码数，匹配阶段按批批量匹配"""
+        self.workers = {stage: max(int(workers.get(stage, 1)), 1) for stage in self.STAGES}
+        self.batch_size = max(int(batch_size), 1)
+        # 每个阶段的输入队列；'write' 为写出阶段（调用方）的输入
+        self.queues = {stage: queue.Queue(max(int(queue_size), 1)) for stage in self.STAGES + ('write',)}
+        self.max_depths = dict.fromkeys(self.queues, 0)
+        self.max_reorder = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._remaining = dict(self.workers)
+        self._threads = []
+        self._errors = []
+        # 阶段 -> [忙碌, 等待输入, 等待下游] 秒数，各线程结束时累加
+        self._times = {stage: [0.0, 0.0, 0.0] for stage in self.STAGES + ('write',)}
+
+    def depths(self):
+        """各队列当前的深度（排队的批数）"""
+        return {stage: stage_queue.qsize() for stage, stage_queue in self.queues.items()}
+
+    def stats(self):
+        """各阶段的线程数、忙碌 / 等待输入 / 等待下游时间（秒）、输入队列峰值，以及重排缓冲区峰值"""
+        stats = {}
+        for stage in self.STAGES + ('write',):
+            busy, idle, blocked = self._times[stage]
+            stats[stage] = {'workers': self.workers.get(stage, 1), 'busy': busy, 'idle': idle, 'blocked': blocked,
+                            'max_queue': self.max_depths[stage]}
+        stats['reorder_max'] = self.max_reorder
+        return stats
+
+    def _put(self, stage, item):
+        """放入 stage 的输入队列，队列满时等待；返回等待的秒数"""
+        stage_queue = self.queues[stage]
+        start = time.perf_counter()
+        while True:
+            try:
+                stage_queue.put(item, timeout=_POLL_SECONDS)
+                break
+            except queue.Full:
+                if self._stop.is_set():
+                    raise PipelineStopped()
+        depth = stage_queue.qsize()
+        if depth > self.max_depths[stage]:
+            self.max_depths[stage] = depth
+        return time.perf_counter() - start
+
+    def _get(self, stage):
+        """从 stage 的输入队列取出任务，队列空时等待；返回 (任务, 等待的秒数)"""
+        stage_queue = self.queues[stage]
+        start = time.perf_counter()
+        while True:
+            try:
+                return stage_queue.get(timeout=_POLL_SECONDS), time.perf_counter() - start
+            except queue.Empty:
+                if self._stop.is_set():
+                    raise PipelineStopped()
+
+    def _feed(self, codes):
+        """输入线程：按 batch_size 切分编码放入匹配队列"""
+        try:
+            for start in range(0, len(codes), self.batch_size):
+                self._put('match', (start, codes[start:start + self.batch_size]))
+            for _ in range(self.workers['match']):
+                self._put('match', _DONE)
+        except PipelineStopped:
+            pass
+
+    def _work(self, stage, next_stage, func, state_factory):
+        """阶段工作线程：func(批, 线程状态) 返回交给下一阶段的批"""
+        state = state_factory() if state_factory is not None else None
+        busy = idle = blocked = 0.0
+        try:
+            while True:
+                item, waited = self._get(stage)
+                idle += waited
+                if item is _DONE:
+                    break
+                start = time.perf_counter()
+                output = func(item, state)
+                busy += time.perf_counter() - start
+                blocked += self._put(next_stage, output)
+            with self._lock:
+                self._remaining[stage] -= 1
+                last = self._remaining[stage] == 0
+            if last:
+                # 本阶段最后一个线程结束后通知下游
+                for _ in range(self.workers.get(next_stage, 1)):
+                    self._put(next_stage, _DONE)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            with self._lock:
+                self._times[stage][0] += busy
+                self._times[stage][1] += idle
+                self._times[stage][2] += blocked
+
+    def run(self, codes, match_func, merge_func, render_func, render_state=None):
+        """启动各阶段线程，按输入顺序逐个产出完成渲染的 CodeJob，由调用方完成写出
+
+        match_func(起始序号, 编码列表) 返回该批的 CodeJob 列表；merge_func(job) 与 render_func(job, 线程状态)
+        就地填充任务；render_state 为渲染线程的状态工厂（每个线程调用一次，如各自的临时格式化器）。
+        调用方提前结束迭代（取消）或任一阶段出错时停止全部线程；阶段中的异常在此重新抛出。
+        """
+        def match(item, state):
+            start, chunk = item
+            return start, match_func(start, chunk)
+
+        def merge(batch, state):
+            for job in batch[1]:
+                merge_func(job)
+            return batch
+
+        def render(batch, state):
+            for job in batch[1]:
+                render_func(job, state)
+            return batch
+
+        self._threads = [threading.Thread(target=self._feed, args=(codes,), daemon=True)]
+        for stage, next_stage, func, state_factory in (('match', 'merge', match, None),
+                                                       ('merge', 'render', merge, None),
+                                                       ('render', 'write', render, render_state)):
+            self._threads.extend(threading.Thread(target=self._work, args=(stage, next_stage, func, state_factory),
+                                                  daemon=True) for _ in range(self.workers[stage]))
+        for thread in self._threads:
+            thread.start()
+
+        pending = {}
+        next_seq = 0
+        busy = idle = 0.0
+        try:
+            while next_seq < len(codes):
+                try:
+                    batch, waited = self._get('write')
+                except PipelineStopped:
+                    break
+                idle += waited
+                if batch is _DONE:
+                    continue
+                pending[batch[0]] = batch[1]
+                if len(pending) > self.max_reorder:
+                    self.max_reorder = len(pending)
+                while next_seq in pending:
+                    start = time.perf_counter()
+                    for job in pending.pop(next_seq):
+                        yield job
+                        next_seq += 1
+                    busy += time.perf_counter() - start
+        finally:
+            self._stop.set()
+            for thread in self._threads:
+                thread.join()
+            self._times['write'] = [busy, idle, 0.0]
+        if self._errors:
+            raise self._errors[0]
@@ -1,82 +1,576 @@
 # src/core/processor.py
+import importlib
+import io
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from .matcher import HTSMatcher
-from .email_content import EmailContentExtractor
-from .formatter import WordFormatter
-from config.settings import GREETINGS, CLOSINGS, SIGNATURE
+from .email_content import EmailContentExtractor, LabelTable
+from .sharded_formatter import ShardedWordFormatter
+from .instrumentation import BatchMetrics, stage_timer, profiling
+from .pipeline import StagedPipeline, CodeJob
+from ..utils.lru_cache import LRUCache
+from config.settings import (GREETINGS, CLOSINGS, SIGNATURE, PROCESS_POOL_WORKERS, PROCESS_POOL_CHUNK_SIZE,
+                             CODE_CACHE_SIZE, CONTENT_CACHE_SIZE, FRAGMENT_CACHE_SIZE, OUTPUT_SHARD_SIZE,
+                             MATCH_MANY_THRESHOLD, PROFILE_MODE, WORD_BACKEND, SUGGEST_LIMIT, PIPELINE_ENABLED,
+                             PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE, PIPELINE_BATCH_SIZE)
 
+# 流水线渲染线程的临时文档累积的正文块超过该数量后换用新文档，内存占用不随批量增长
+_SCRATCH_BLOCK_LIMIT = 2000
+
+# settings.WORD_BACKEND -> (格式化器模块, 类名)；选用时才导入，只输出文本时不会加载 python-docx
+WORD_FORMATTERS = {'python-docx': ('.formatter', 'WordFormatter'), 'xml': ('.xml_formatter', 'XmlWordFormatter')}
+
+# 工作进程内常驻的处理器，由 _init_worker 在进程启动时创建一次
+_worker_processor = None
+
+
+def word_formatter_class(word_backend):
+    """按 Word 生成方式导入并返回格式化器类"""
+    if word_backend not in WORD_FORMATTERS:
+        raise ValueError(f"未知的 Word 生成方式: {word_backend}")
+    module_name, class_name = WORD_FORMATTERS[word_backend]
+    return getattr(importlib.import_module(module_name, __package__), class_name)
+
+
+def _init_worker(hts_index, email_templates, word_backend):
+    """进程池初始化函数：每个工作进程只加载一次 HTS 索引与邮件模板"""
+    global _worker_processor
+    # 工作进程由 fork 创建时会继承父进程的信号处理（如服务把 SIGTERM 转为 KeyboardInterrupt），
+    # 恢复默认处理，整个进程组收到 SIGTERM 时工作进程直接退出，不会各自打印 KeyboardInterrupt 回溯
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _worker_processor = HTSProcessor(hts_index, email_templates, output_file=None, workers=0,
+                                     word_backend=word_backend)
 
-class HTSProcessor:
-    """协调核心逻辑的高级别类"""
 
-    def __init__(self, hts_data, email_templates):
+def _process_chunk_in_worker(codes, render_word=True):
+    """在工作进程中处理一组编码，返回每个编码的 (结果, 正文 XML 片段, 日志, 统计记录)；
+    render_word 为 False 时不生成 Word 内容，片段为 None"""
+    processor = _worker_processor
+    snapshot = processor.snapshot
+    formatter = processor.formatter_class(None) if render_word else None
+    metrics = BatchMetrics(len(codes), keep_records=True)
+    outputs = []
+    for code, matched_columns in zip(codes, processor._match_batch(codes, snapshot)):
+        messages = []
+        if formatter is None:
+            result = processor.process_single_code(code, messages.append, matched_columns, metrics, snapshot)
+            outputs.append((result, None, messages, metrics.records[-1]))
+            continue
+        start = formatter.body_length()
+        formatter.begin_code(code)
+        result = processor.process_single_code(code, messages.append, matched_columns, metrics, snapshot, formatter)
+        outputs.append((result, formatter.export_body_xml(start), messages, metrics.records[-1]))
+    return outputs
+
+
+def _render_document_in_worker(codes):
+    """在工作进程中把一组编码渲染为一个 Word 文档，返回 (结果列表, docx 字节)"""
+    return _worker_processor.render_document(codes)
+
+
+class DataSnapshot:
+    """一次加载得到的 HTS 索引、邮件模板及依赖它们的结果缓存
+
+    重新加载数据时整体替换为新快照；批处理开始时取得快照引用，进行中的批处理始终使用同一份数据完成。
+    """
+
+    def __init__(self, hts_data, email_templates, version=1):
         self.hts_data = hts_data
         self.email_templates = email_templates
-        self.matcher = HTSMatcher()
+        self.version = version
+        self.matcher = HTSMatcher(hts_data)
+        self.label_table = LabelTable(self.matcher.index.columns, email_templates)
+        # 编码 -> 匹配列；匹配列组合 -> 合并后的邮件内容与显示文本；内容组合 -> 已渲染的正文片段
+        self.code_cache = LRUCache(CODE_CACHE_SIZE)
+        self.content_cache = LRUCache(CONTENT_CACHE_SIZE)
+        self.fragment_cache = LRUCache(FRAGMENT_CACHE_SIZE)
+
+    def derive(self, hts_data=None, email_templates=None):
+        """基于当前快照生成新快照，只替换传入的数据；未变化部分的索引与缓存直接沿用
+
+        匹配结果只依赖 HTS 数据，邮件内容与渲染片段只依赖邮件模板，因此只改模板时保留索引与编码缓存，
+        只改 HTS 数据时保留内容与片段缓存。
+        """
+        snapshot = DataSnapshot.__new__(DataSnapshot)
+        snapshot.version = self.version + 1
+        if hts_data is None:
+            snapshot.hts_data, snapshot.matcher, snapshot.code_cache = self.hts_data, self.matcher, self.code_cache
+        else:
+            snapshot.hts_data = hts_data
+            snapshot.matcher = HTSMatcher(hts_data)
+            snapshot.code_cache = LRUCache(CODE_CACHE_SIZE)
+        if email_templates is None:
+            snapshot.email_templates = self.email_templates
+            snapshot.content_cache, snapshot.fragment_cache = self.content_cache, self.fragment_cache
+        else:
+            snapshot.email_templates = email_templates
+            snapshot.content_cache = LRUCache(CONTENT_CACHE_SIZE)
+            snapshot.fragment_cache = LRUCache(FRAGMENT_CACHE_SIZE)
+        snapshot.label_table = LabelTable(snapshot.matcher.index.columns, snapshot.email_templates)
+        return snapshot
+
+    def cache_stats(self):
+        """返回结果缓存的命中/未命中统计"""
+        return {'code': self.code_cache.stats(), 'content': self.content_cache.stats(),
+                'fragment': self.fragment_cache.stats()}
+
+    def cache_hits(self):
+        return self.code_cache.hits + self.content_cache.hits + self.fragment_cache.hits
+
+
+class HTSProcessor:
+    """协调核心逻辑的高级别类"""
+
+    def __init__(self, hts_data, email_templates, output_file="HTS_Email.docx", workers=None,
+                 chunk_size=PROCESS_POOL_CHUNK_SIZE, shard_size=None, event_func=None, profile_mode=None,
+                 word_backend=None, sinks=None, pipeline=None, pipeline_workers=None, pipeline_queue_size=None):
+        """output_file 为 None 时不生成 Word 文档（只输出文本、HTML 等）；
+        sinks 为 output_sinks 中的输出目标列表，每个编码处理完成后依次写入；
+        pipeline 为 True 时批处理使用进程内流水线（见 StagedPipeline），pipeline_workers 为各阶段线程数，
+        pipeline_queue_size 为阶段间队列容量，未提供时取 settings 中的 PIPELINE_* 配置"""
+        # 当前数据快照；reload_data 整体替换，读取时无需加锁
+        self.snapshot = DataSnapshot(hts_data, email_templates)
+        self._reload_lock = threading.Lock()
         self.extractor = EmailContentExtractor()
-        self.formatter = WordFormatter("HTS_Email.docx")
+        self.shard_size = OUTPUT_SHARD_SIZE if shard_size is None else shard_size
+        # Word 生成方式：'xml' 直接写出 WordprocessingML，'python-docx' 使用 python-docx 对象模型
+        self.word_backend = word_backend or WORD_BACKEND
+        if self.word_backend not in WORD_FORMATTERS:
+            raise ValueError(f"未知的 Word 生成方式: {self.word_backend}")
+        self._formatter_class = None
+        self.sinks = list(sinks or [])
+        self.pipeline = PIPELINE_ENABLED if pipeline is None else pipeline
+        self.pipeline_workers = dict(PIPELINE_WORKERS, **(pipeline_workers or {}))
+        self.pipeline_queue_size = pipeline_queue_size or PIPELINE_QUEUE_SIZE
+        # 片段缓存属于数据快照，渲染时按调用传入
+        if output_file is None:
+            self.formatter = None
+        elif self.shard_size > 0:
+            # 分片输出：每 shard_size 个编码写一个文件，内存占用不随批量增长
+            self.formatter = ShardedWordFormatter(output_file, self.shard_size, formatter_class=self.formatter_class,
+                                                  save_workers=self.pipeline_workers['save'] if self.pipeline else 0)
+        else:
+            self.formatter = self.formatter_class(output_file)
+        self.workers = PROCESS_POOL_WORKERS if workers is None else workers
+        self.chunk_size = chunk_size
+        self._pool = None
+        self._pool_snapshot = None
+        self._pool_fallback_logged = False
+        # 结构化统计事件回调与性能剖析模式（None / 'cprofile' / 'tracemalloc'）
+        self.event_func = event_func
+        self.profile_mode = PROFILE_MODE if profile_mode is None else profile_mode
+
+    @property
+    def formatter_class(self):
+        """当前 Word 生成方式的格式化器类，首次使用时导入"""
+        if self._formatter_class is None:
+            self._formatter_class = word_formatter_class(self.word_backend)
+        return self._formatter_class
+
+    # 以下属性始终指向当前快照，供只关心最新数据的调用方使用
+    @property
+    def hts_data(self):
+        return self.snapshot.hts_data
+
+    @property
+    def email_templates(self):
+        return self.snapshot.email_templates
+
+    @property
+    def matcher(self):
+        return self.snapshot.matcher
+
+    @property
+    def code_cache(self):
+        return self.snapshot.code_cache
+
+    @property
+    def content_cache(self):
+        return self.snapshot.content_cache
+
+    @property
+    def fragment_cache(self):
+        return self.snapshot.fragment_cache
+
+    def reload_data(self, hts_data=None, email_templates=None):
+        """替换 HTS 数据和/或邮件模板（传 None 表示该项不变），原子切换到新快照并返回
+
+        可在后台线程调用：进行中的批处理继续使用旧快照完成，之后提交的批处理使用新快照；
+        进程池在下一次多进程批处理时按新快照重建。
+        """
+        with self._reload_lock:
+            self.snapshot = self.snapshot.derive(hts_data, email_templates)
+            return self.snapshot
+
+    def cache_stats(self, snapshot=None):
+        """返回结果缓存的命中/未命中统计"""
+        return (snapshot or self.snapshot).cache_stats()
+
+    def process_multi_code(self, codes, logger_func=print, save=True, event_func=None, formatter=None, sinks=None,
+                           cancel_event=None):
+        """依次处理多个编码；save=False 时只追加到文档而不写盘，便于分块调用后统一保存
+
+        event_func 接收结构化统计事件（见 BatchMetrics），未提供时使用构造时传入的 event_func；
+        formatter 指定本批写入的文档，默认为 self.formatter，两者都为 None 时不做任何 Word 处理；
+        sinks 为本批写入的输出目标，默认为 self.sinks，由创建者负责关闭；
+        cancel_event（threading.Event）被设置后在编码之间停止，已生成的内容照常保存，返回已处理部分的结果。
+        """
+        event_func = event_func or self.event_func
+        formatter = formatter or self.formatter
+        sinks = self.sinks if sinks is None else sinks
+        # 整批使用同一份快照，期间发生的重新加载不影响本批结果
+        snapshot = self.snapshot
+        metrics = BatchMetrics(len(codes), event_func)
+        pipeline_stats = None
+        use_pool = self.workers > 1 and len(codes) > self.chunk_size
+        if use_pool and formatter is not None and not self.formatter_class.RENDER_IN_WORKERS:
+            # python-docx 的正文元素无法廉价地跨进程传递，只能在主进程渲染；工作进程只剩代价很小的匹配与合并，
+            # 多进程反而比串行慢，因此改用串行（或流水线）处理
+            use_pool = False
+            if not self._pool_fallback_logged:
+                self._pool_fallback_logged = True
+                logger_func(f"提示: 多进程批处理只适用于 WORD_BACKEND='xml'，当前为 '{self.word_backend}'，"
+                            f"将在当前进程内处理\n")
+        with profiling(self.profile_mode, event_func):
+            if use_pool:
+                results = self._process_multi_code_parallel(codes, logger_func, metrics, snapshot, formatter, sinks,
+                                                            cancel_event)
+            elif self.pipeline and len(codes) > 1:
+                results, pipeline_stats = self._process_multi_code_pipeline(codes, logger_func, metrics, snapshot,
+                                                                            formatter, sinks, cancel_event)
+            else:
+                results = []
+                with stage_timer(metrics.stage_totals, 'match_batch'):
+                    batch_matches = self._match_batch(codes, snapshot)
+                for code, matched_columns in zip(codes, batch_matches):
+                    if cancel_event is not None and cancel_event.is_set():
+                        metrics.cancelled = True
+                        break
+                    if formatter is not None:
+                        formatter.begin_code(code)
+                    result = self.process_single_code(code, logger_func, matched_columns, metrics, snapshot,
+                                                      formatter)
+                    self._write_sinks(sinks, result, metrics, snapshot)
+                    results.append(result)
+            if save and formatter is not None:
+                with stage_timer(metrics.stage_totals, 'save'):
+                    formatter.save()
+            for sink in sinks:
+                sink.flush()
+        metrics.finish(snapshot.cache_stats(), formatter.document_stats() if formatter is not None else None,
+                       pipeline_stats)
+        return results
+
+    def _process_multi_code_pipeline(self, codes, logger_func, metrics, snapshot, formatter, sinks, cancel_event):
+        """进程内流水线：匹配、合并、渲染在各自的线程中进行，本线程按输入顺序写出文档、输出目标与统计
+
+        格式化器的 RENDER_IN_WORKERS 为 True 时（xml），渲染线程各自写入临时文档再导出正文片段，由本线程拼接到
+        formatter；为 False 时（python-docx），导出的片段需重新解析，代价高于直接渲染，因此由本线程按输入顺序
+        从片段缓存渲染到 formatter，渲染线程不做 Word 处理。日志按编码收集后按顺序输出。
+        各阶段并发访问缓存，逐码事件中的缓存命中数记为 0，整批命中数在结束时一次计入。
+        返回 (结果列表, 流水线统计)。
+        """
+        pipeline = StagedPipeline(self.pipeline_workers, self.pipeline_queue_size, PIPELINE_BATCH_SIZE)
+        metrics.queue_depths = pipeline.depths
+        hits_before = snapshot.cache_hits()
+        match_batch_seconds = []
+
+        def match(start, chunk):
+            batch_start = time.perf_counter()
+            batch_matches = self._match_batch(chunk, snapshot)
+            match_batch_seconds.append(time.perf_counter() - batch_start)
+            jobs = []
+            for seq, (code, matched_columns) in enumerate(zip(chunk, batch_matches), start):
+                job = CodeJob(seq, code)
+                job.result, job.matched_columns = self._match_step(code, job.messages.append, matched_columns,
+                                                                   job.stage_times, snapshot)
+                jobs.append(job)
+            return jobs
+
+        def merge(job):
+            if job.matched_columns:
+                job.content = self._merge_step(job.result, job.matched_columns, job.messages.append, job.stage_times,
+                                               snapshot)
+
+        def render(job, scratch):
+            if render_in_writer:
+                return
+            if scratch is None:
+                if job.content is not None:
+                    self._render_step(job.result, job.content, job.messages.append, job.stage_times, snapshot, None)
+                return
+            if scratch[0].body_length() > _SCRATCH_BLOCK_LIMIT:
+                scratch[0] = self.formatter_class(None)
+            start = scratch[0].body_length()
+            scratch[0].begin_code(job.code)
+            if job.content is not None:
+                self._render_step(job.result, job.content, job.messages.append, job.stage_times, snapshot,
+                                  scratch[0])
+            job.fragments = scratch[0].export_body_xml(start)
 
-    def process_multi_code(self, codes, logger_func=print):
         results = []
+        render_in_writer = formatter is not None and not self.formatter_class.RENDER_IN_WORKERS
+        render_state = None if formatter is None or render_in_writer else (lambda: [self.formatter_class(None)])
+        jobs = pipeline.run(codes, match, merge, render, render_state)
+        try:
+            for job in jobs:
+                if cancel_event is not None and cancel_event.is_set():
+                    metrics.cancelled = True
+                    break
+                for message in job.messages:
+                    logger_func(message)
+                if render_in_writer:
+                    formatter.begin_code(job.code)
+                    if job.content is not None:
+                        self._render_step(job.result, job.content, logger_func, job.stage_times, snapshot, formatter)
+                elif formatter is not None:
+                    with stage_timer(metrics.stage_totals, 'assemble'):
+                        formatter.append_code_xml(job.code, job.fragments)
+                metrics.record_code(job.result['code'], job.stage_times, len(job.result['matched_columns']), 0)
+                self._write_sinks(sinks, job.result, metrics, snapshot, job.content)
+                results.append(job.result)
+        finally:
+            jobs.close()
+        metrics.stage_totals['match_batch'] += sum(match_batch_seconds)
+        metrics.cache_hits += snapshot.cache_hits() - hits_before
+        return results, pipeline.stats()
+
+    def _write_sinks(self, sinks, result, metrics, snapshot, merged=None):
+        """把一个编码的结果及合并后的邮件内容（文本与样式）写入各输出目标；merged 为已合并的内容（可省略）"""
+        if not sinks:
+            return
+        with stage_timer(metrics.stage_totals, 'export'):
+            content = None
+            if result['en_content'] is not None:
+                if merged is None:
+                    merged = self._merge_content(tuple(result['matched_columns']), snapshot)
+                content = merged[:4]
+            for sink in sinks:
+                sink.write(result, content)
+
+    def match_codes(self, codes, snapshot=None):
+        """只做匹配：返回 [(编码, 匹配列元组), ...]，顺序与输入一致"""
+        snapshot = snapshot or self.snapshot
+        matches = []
+        for code, matched_columns in zip(codes, self._match_batch(codes, snapshot)):
+            code = code.strip()
+            if matched_columns is None:
+                matched_columns = self._match_code(code, snapshot)
+            matches.append((code, matched_columns))
+        return matches
+
+    def audit_matches(self, codes):
+        """匹配并说明来源：返回 [(编码, 匹配列元组, [(列名, DB 编码, 编码位数), ...]), ...]"""
+        snapshot = self.snapshot
+        return [(code, matched_columns, snapshot.matcher.match_sources(code))
+                for code, matched_columns in self.match_codes(codes, snapshot)]
+
+    def suggest_codes(self, prefix, limit=SUGGEST_LIMIT):
+        """输入联想：返回 (候选总数, [{'code', 'columns', 'labels'}, ...])，列出以 prefix 开头的 DB 编码
+        及其（含上级编码）会匹配的列与邮件标签；prefix 不是纯数字时没有候选"""
+        prefix = prefix.strip()
+        if not prefix.isdigit():
+            return 0, []
+        snapshot = self.snapshot
+        index = snapshot.matcher.index
+        label_table = snapshot.label_table
+        codes, total = index.suggest(prefix, limit)
+        suggestions = []
         for code in codes:
-            self.formatter.add_paragraph(f"编码:{code} 模板如下：", before_black=1, after_black=1)
-            result = self.process_single_code(code, logger_func)
+            columns = index.columns_from_mask(index.ancestor_masks[code])
+            labels = [label_table.labels[label_id] for label_id in label_table.label_ids(columns)]
+            suggestions.append({'code': code, 'columns': columns, 'labels': labels})
+        return total, suggestions
+
+    def render_text(self, codes):
+        """只生成界面显示用的邮件文本，不写 Word 文档；返回与 process_multi_code 相同结构的结果"""
+        snapshot = self.snapshot
+        results = []
+        for code, matched_columns in self.match_codes(codes):
+            result = {'code': code, 'matched_columns': list(matched_columns), 'en_content': None, 'ch_content': None}
+            if matched_columns:
+                en_text_parts, _, ch_text_parts, _, en_full_content, ch_full_content = \
+                    self._merge_content(matched_columns, snapshot)
+                if en_text_parts or ch_text_parts:
+                    result['en_content'] = en_full_content
+                    result['ch_content'] = ch_full_content
             results.append(result)
-        self.formatter.save()
         return results
 
-    def process_single_code(self, code, logger_func=print):
-        """处理单个HTS编码的完整流程，返回生成的邮件内容"""
+    def render_document(self, codes):
+        """把一组编码渲染为一个独立的 Word 文档，返回 (结果列表, docx 字节)；不写盘，也不影响 self.formatter"""
+        buffer = io.BytesIO()
+        results = self.process_multi_code(codes, lambda msg: None, formatter=self.formatter_class(buffer))
+        return results, buffer.getvalue()
+
+    def submit_render_document(self, codes):
+        """在进程池中执行 render_document，返回 concurrent.futures.Future；需 workers > 1"""
+        return self._get_pool(self.snapshot).submit(_render_document_in_worker, codes)
+
+    def _get_pool(self, snapshot):
+        """懒加载进程池，工作进程在初始化时预载索引与模板；快照更换后重建进程池"""
+        if self._pool is not None and self._pool_snapshot is not snapshot:
+            # 已提交给旧进程池的任务仍会完成，不必等待
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(snapshot.matcher.index, snapshot.email_templates, self.word_backend)
+            )
+            self._pool_snapshot = snapshot
+        return self._pool
+
+    def _process_multi_code_parallel(self, codes, logger_func, metrics, snapshot, formatter, sinks, cancel_event):
+        """多进程模式：按块分发给工作进程，再按输入顺序合并结果、文档片段与统计"""
+        chunks = [codes[i:i + self.chunk_size] for i in range(0, len(codes), self.chunk_size)]
+        results = []
+        chunk_outputs = self._get_pool(snapshot).map(_process_chunk_in_worker, chunks, repeat(formatter is not None))
+        for outputs in chunk_outputs:
+            for result, fragments, messages, record in outputs:
+                if cancel_event is not None and cancel_event.is_set():
+                    # 关闭结果迭代器会取消尚未开始的分块
+                    chunk_outputs.close()
+                    metrics.cancelled = True
+                    return results
+                for message in messages:
+                    logger_func(message)
+                if formatter is not None:
+                    with stage_timer(metrics.stage_totals, 'assemble'):
+                        formatter.append_code_xml(result['code'], fragments)
+                metrics.record_code(*record)
+                self._write_sinks(sinks, result, metrics, snapshot)
+                results.append(result)
+        return results
+
+    def close(self):
+        """关闭进程池（如有）"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+            self._pool_snapshot = None
+
+    def process_single_code(self, code, logger_func=print, matched_columns=None, metrics=None, snapshot=None,
+                            formatter=None):
+        """处理单个HTS编码的完整流程，返回生成的邮件内容；matched_columns 为批量匹配预先算好的结果，
+        metrics 为 BatchMetrics 时记录该编码的分阶段耗时、匹配列数与缓存命中数，snapshot 默认为当前数据快照，
+        formatter 默认为 self.formatter，为 None 时不生成 Word 内容"""
+        snapshot = snapshot or self.snapshot
+        stage_times = {}
+        hits_before = snapshot.cache_hits()
+        result = self._process_code(code, logger_func, matched_columns, stage_times, snapshot,
+                                    formatter or self.formatter)
+        if metrics is not None:
+            metrics.record_code(result['code'], stage_times, len(result['matched_columns']),
+                                snapshot.cache_hits() - hits_before)
+        return result
+
+    def _process_code(self, code, logger_func, matched_columns, stage_times, snapshot, formatter):
+        result, matched_columns = self._match_step(code, logger_func, matched_columns, stage_times, snapshot)
+        if matched_columns:
+            content = self._merge_step(result, matched_columns, logger_func, stage_times, snapshot)
+            if content is not None:
+                self._render_step(result, content, logger_func, stage_times, snapshot, formatter)
+        return result
+
+    def _match_step(self, code, logger_func, matched_columns, stage_times, snapshot):
+        """匹配阶段：返回 (结果字典, 匹配列元组)；matched_columns 为批量匹配预先算好的结果"""
         logger_func(f"\n============================= 处理编码: {code} ==================================\n")
 
-        matched_columns = self.matcher.find_matching_columns(code, self.hts_data)
+        code = code.strip()
+        with stage_timer(stage_times, 'match'):
+            if matched_columns is None:
+                matched_columns = self._match_code(code, snapshot)
         result = {
             'code': code,
-            'matched_columns': matched_columns,
+            'matched_columns': list(matched_columns),
             'en_content': None,
             'ch_content': None
         }
 
         if not matched_columns:
             logger_func("❌ 无匹配列\n")
-            return result
+            return result, matched_columns
 
         for i, column in enumerate(matched_columns, 1):
             logger_func(f"{i}. {column}\n")
 
         logger_func("\n")
+        return result, matched_columns
 
-        en_text_parts, en_style_parts, ch_text_parts, ch_style_parts = self.extractor.extract_and_merge_content(
-            matched_columns, self.email_templates)
+    def _merge_step(self, result, matched_columns, logger_func, stage_times, snapshot):
+        """合并阶段：合并邮件内容并填入结果的显示文本；没有邮件内容时返回 None"""
+        with stage_timer(stage_times, 'merge'):
+            content = self._merge_content(matched_columns, snapshot)
 
-        if not en_text_parts and not ch_text_parts:
+        if not content[0] and not content[2]:
             logger_func("❌ 未找到对应的邮件内容\n")
-            return result
+            return None
 
-        # 生成格式化的文本内容（用于界面显示）
-        en_full_content = self._format_for_display(en_text_parts, 'EN')
-        ch_full_content = self._format_for_display(ch_text_parts, 'CH')
+        result['en_content'] = content[4]
+        result['ch_content'] = content[5]
+        return content
 
-        result['en_content'] = en_full_content
-        result['ch_content'] = ch_full_content
+    def _render_step(self, result, content, logger_func, stage_times, snapshot, formatter):
+        """渲染阶段：把合并后的内容写入 formatter（为 None 时不生成 Word 内容）"""
+        code = result['code']
+        en_text_parts, en_style_parts, ch_text_parts, ch_style_parts = content[:4]
+        if formatter is None:
+            logger_func(f"============================= 处理完成: {code} ==================================\n\n")
+            return
 
-        if en_text_parts:
-            try:
-                self.formatter.format_and_save_word(en_text_parts, en_style_parts, code, 'EN')
-                logger_func("✅ 英文邮件内容已生成\n")
-            except Exception as e:
-                logger_func(f"❌ 生成英文Word文件失败: {e}\n")
+        with stage_timer(stage_times, 'render'):
+            if en_text_parts:
+                try:
+                    formatter.format_and_save_word(en_text_parts, en_style_parts, code, 'EN',
+                                                  snapshot.fragment_cache)
+                    logger_func("✅ 英文邮件内容已生成\n")
+                except Exception as e:
+                    logger_func(f"❌ 生成英文Word文件失败: {e}\n")
 
-        self.formatter.add_paragraph(after_black=1)
+            formatter.add_paragraph(after_black=1)
 
-        if ch_text_parts:
-            try:
-                self.formatter.format_and_save_word(ch_text_parts, ch_style_parts, code, 'CH')
-                logger_func("✅ 中文邮件内容已生成\n")
-            except Exception as e:
-                logger_func(f"❌ 生成中文Word文件失败: {e}\n")
+            if ch_text_parts:
+                try:
+                    formatter.format_and_save_word(ch_text_parts, ch_style_parts, code, 'CH',
+                                                  snapshot.fragment_cache)
+                    logger_func("✅ 中文邮件内容已生成\n")
+                except Exception as e:
+                    logger_func(f"❌ 生成中文Word文件失败: {e}\n")
 
         logger_func(f"============================= 处理完成: {code} ==================================\n\n")
-        return result
+
+    def _match_batch(self, codes, snapshot):
+        """编码数量超过阈值时一次性批量匹配，否则返回 None 由逐个匹配处理"""
+        if len(codes) <= MATCH_MANY_THRESHOLD:
+            return [None] * len(codes)
+        return snapshot.matcher.lookup_many([code.strip() for code in codes])
+
+    def _match_code(self, code, snapshot):
+        """查找编码的匹配列，结果按编码缓存"""
+        matched_columns = snapshot.code_cache.get(code)
+        if matched_columns is None:
+            matched_columns = tuple(snapshot.matcher.lookup(code))
+            snapshot.code_cache.put(code, matched_columns)
+        return matched_columns
+
+    def _merge_content(self, matched_columns, snapshot):
+        """合并匹配列对应的邮件内容并生成显示文本，结果按匹配列组合缓存"""
+        content = snapshot.content_cache.get(matched_columns)
+        if content is None:
+            en_text_parts, en_style_parts, ch_text_parts, ch_style_parts = \
+                self.extractor.extract_and_merge_content(matched_columns, snapshot.email_templates,
+                                                         snapshot.label_table)
+            # 生成格式化的文本内容（用于界面显示）
+            content = (en_text_parts, en_style_parts, ch_text_parts, ch_style_parts,
+                       self._format_for_display(en_text_parts, 'EN'),
+                       self._format_for_display(ch_text_parts, 'CH'))
+            snapshot.content_cache.put(matched_columns, content)
+        return content
 
     def _format_for_display(self, text_parts, language):
         """格式化内容用于界面显示"""
@@ -0,0 +1,97 @@
+# src/core/sharded_formatter.py
+import gc
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ShardedWordFormatter:
+    """按编码数量滚动输出多个 Word 文件，内存中只保留当前分片的文档，并生成分片索引文件"""
+
+    def __init__(self, file_name, shard_size, fragment_cache=None, formatter_class=None, save_workers=0):
+        """formatter_class 为每个分片使用的格式化器（WordFormatter 或 XmlWordFormatter，默认 WordFormatter）；
+        save_workers > 0 时写满的分片由该数量的后台线程保存，与后续编码的处理重叠；
+        正在保存的分片达到该数量时先等待最早的一个完成，内存中的分片数有上界"""
+        if formatter_class is None:
+            from .formatter import WordFormatter
+            formatter_class = WordFormatter
+        self.file_name = file_name
+        self.shard_size = max(int(shard_size), 1)
+        self.fragment_cache = fragment_cache
+        self.formatter_class = formatter_class
+        self.base_name, self.extension = os.path.splitext(file_name)
+        self.index_file = f"{self.base_name}_index.json"
+        # 每个分片: {'file': 文件名, 'codes': [编码, ...]}
+        self.shards = []
+        self.current = None
+        self.current_count = 0
+        self.save_workers = save_workers
+        self._save_executor = ThreadPoolExecutor(max_workers=save_workers) if save_workers > 0 else None
+        self._saving = []
+
+    def _shard_for(self, code):
+        """返回写入该编码的分片，当前分片已满时先保存并开启新分片"""
+        if self.current is None or self.current_count >= self.shard_size:
+            self._flush()
+            shard_file = f"{self.base_name}_{len(self.shards) + 1:05d}{self.extension}"
+            self.current = self.formatter_class(shard_file, self.fragment_cache)
+            self.current_count = 0
+            self.shards.append({'file': os.path.basename(shard_file), 'codes': []})
+        self.shards[-1]['codes'].append(code)
+        self.current_count += 1
+        return self.current
+
+    def _flush(self):
+        """保存并释放当前分片的文档"""
+        if self.current is None:
+            return
+        shard, self.current = self.current, None
+        if self._save_executor is None:
+            self._save_shard(shard)
+            return
+        # 后台保存的分片已达上限时先等最早的一个完成（并抛出其中的异常）
+        while len(self._saving) >= self.save_workers:
+            self._saving.pop(0).result()
+        self._saving.append(self._save_executor.submit(self._save_shard, shard))
+
+    @staticmethod
+    def _save_shard(shard):
+        shard.save()
+        # python-docx 的 Document 与各 Part 之间存在循环引用，主动回收以及时释放整棵 XML 树
+        gc.collect()
+
+    def _wait_saving(self):
+        while self._saving:
+            self._saving.pop(0).result()
+
+    def begin_code(self, code):
+        self._shard_for(code).begin_code(code)
+
+    def append_code_xml(self, code, fragments):
+        self._shard_for(code).append_code_xml(code, fragments)
+
+    def add_paragraph(self, content=None, before_black=0, after_black=0):
+        self.current.add_paragraph(content, before_black, after_black)
+
+    def format_and_save_word(self, text_parts, style_parts, code, language, fragment_cache=None):
+        self.current.format_and_save_word(text_parts, style_parts, code, language, fragment_cache)
+
+    def document_stats(self):
+        """分片统计：分片数量、已写入的编码数与已保存分片的总字节数"""
+        directory = os.path.dirname(self.file_name)
+        file_bytes = sum(os.path.getsize(os.path.join(directory, shard['file'])) for shard in self.shards
+                         if os.path.exists(os.path.join(directory, shard['file'])))
+        return {'shards': len(self.shards), 'codes': sum(len(shard['codes']) for shard in self.shards),
+                'file_bytes': file_bytes}
+
+    def save(self):
+        """保存最后一个分片，并写出 编码 -> 分片文件 的索引"""
+        self._flush()
+        self._wait_saving()
+        index = {
+            'shard_size': self.shard_size,
+            'shards': self.shards,
+            'codes': {code: shard['file'] for shard in self.shards for code in shard['codes']}
+        }
+        with open(self.index_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,39 @@
+# src/core/style_runs.py
+
+# 样式枚举，STYLE_NAMES[style] 为对应的样式名（与 parse_blurb_with_tags 的样式名一致）
+STYLE_NORMAL, STYLE_RED, STYLE_BOLD, STYLE_REDBOLD = range(4)
+STYLE_NAMES = ('normal', 'red', 'bold', 'redbold')
+STYLE_CODES = {name: code for code, name in enumerate(STYLE_NAMES)}
+
+
+class StyleRun:
+    """模板正文中的一段连续文本：[start, end) 为在全文中的偏移，style 为样式枚举"""
+    __slots__ = ('start', 'end', 'style')
+
+    def __init__(self, start, end, style):
+        self.start = start
+        self.end = end
+        self.style = style
+
+    def __eq__(self, other):
+        return (isinstance(other, StyleRun) and self.start == other.start and self.end == other.end
+                and self.style == other.style)
+
+    def __hash__(self):
+        return hash((self.start, self.end, self.style))
+
+    def __repr__(self):
+        return f"StyleRun({self.start}, {self.end}, {STYLE_NAMES[self.style]})"
+
+
+def compile_style_runs(styled_parts):
+    """将 parse_blurb_with_tags 返回的 [(片段, 样式名)] 转为 StyleRun 元组
+
+    片段按顺序拼接即为全文，偏移直接由片段长度累加得到，渲染时按偏移切片，无需在全文中查找片段。
+    """
+    runs = []
+    offset = 0
+    for part, style in styled_parts:
+        runs.append(StyleRun(offset, offset + len(part), STYLE_CODES[style]))
+        offset += len(part)
+    return tuple(runs)
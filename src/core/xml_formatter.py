@@ -0,0 +1,178 @@
+# src/core/xml_formatter.py
+import io
+import os
+import re
+import zipfile
+from functools import lru_cache
+from .style_runs import STYLE_NORMAL, STYLE_RED, STYLE_BOLD, STYLE_REDBOLD
+from config.settings import GREETINGS, CLOSINGS, SIGNATURE
+
+# 与 WordFormatter._apply_word_style 相同的样式：红色 / 加粗 / 红色加粗（w:b 须位于 w:color 之前）
+_RUN_PROPERTIES = {
+    STYLE_NORMAL: '',
+    STYLE_RED: '<w:rPr><w:color w:val="FF0000"/></w:rPr>',
+    STYLE_BOLD: '<w:rPr><w:b/></w:rPr>',
+    STYLE_REDBOLD: '<w:rPr><w:b/><w:color w:val="FF0000"/></w:rPr>',
+}
+# 制表符与换行在 run 中分别写为 w:tab 与 w:br（同 python-docx 的 Run.text）
+_RUN_BREAKS = re.compile(r'([\t\r\n])')
+# XML 1.0 不允许的字符，python-docx（lxml）遇到时同样会报错
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+_EMPTY_PARAGRAPH = '<w:p/>'
+# 保存时每次合并写入 document.xml 的正文块数：减少 zip 写入与压缩调用次数，压缩时释放 GIL 的时段也更长
+_WRITE_BLOCKS = 512
+
+
+@lru_cache(maxsize=1)
+def _package_template():
+    """由 python-docx 的默认模板生成一次空文档，取得除正文外的全部部件以及 document.xml 的首尾
+
+    每个进程只调用一次 python-docx；之后的段落与 run 都直接以字符串写出。
+    """
+    from docx import Document
+    buffer = io.BytesIO()
+    Document().save(buffer)
+    with zipfile.ZipFile(buffer) as package:
+        parts = [(info.filename, package.read(info.filename)) for info in package.infolist()]
+    document_xml = dict(parts)['word/document.xml']
+    body_start = document_xml.index(b'<w:body>') + len(b'<w:body>')
+    sect_start = document_xml.index(b'<w:sectPr', body_start)
+    return parts, document_xml[:body_start], document_xml[sect_start:]
+
+
+def _escape(text):
+    if _INVALID_XML_CHARS.search(text):
+        raise ValueError("All strings must be XML compatible: Unicode or ASCII, no NULL bytes or control characters")
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def run_xml(text, style=STYLE_NORMAL):
+    """生成一个 w:r 元素，结构与 python-docx 的 Paragraph.add_run(text) 加样式后一致"""
+    content = []
+    for piece in _RUN_BREAKS.split(text):
+        if not piece:
+            continue
+        if piece == '\t':
+            content.append('<w:tab/>')
+        elif piece in '\r\n':
+            content.append('<w:br/>')
+        elif len(piece.strip()) < len(piece):
+            content.append(f'<w:t xml:space="preserve">{_escape(piece)}</w:t>')
+        else:
+            content.append(f'<w:t>{_escape(piece)}</w:t>')
+    inner = _RUN_PROPERTIES[style] + ''.join(content)
+    return f'<w:r>{inner}</w:r>' if inner else '<w:r/>'
+
+
+def paragraph_xml(text=None):
+    """生成只含一个普通 run 的段落；text 为空时为空段落"""
+    return f'<w:p>{run_xml(text)}</w:p>' if text else _EMPTY_PARAGRAPH
+
+
+class XmlWordFormatter:
+    """直接写出 WordprocessingML 的 Word 格式化器，接口与 WordFormatter 相同
+
+    段落以 XML 字符串累积，保存时按 python-docx 空文档的部件写出 docx，并流式写入 document.xml；
+    不为每个段落和 run 创建 python-docx / lxml 对象，生成的文档内容与 WordFormatter 一致。
+    """
+
+    # 正文块为字符串，工作进程渲染后传回主进程直接拼接
+    RENDER_IN_WORKERS = True
+
+    def __init__(self, file_name, fragment_cache=None):
+        """fragment_cache: 可选的 LRUCache，缓存每种内容组合已生成的正文 XML"""
+        self.file_name = file_name
+        self.fragment_cache = fragment_cache
+        # 正文 XML 块（每块可含多个段落）及各块的段落数
+        self._blocks = []
+        self._block_paragraphs = []
+
+    def _append(self, xml, paragraphs=1):
+        self._blocks.append(xml)
+        self._block_paragraphs.append(paragraphs)
+
+    def add_paragraph(self, content=None, before_black=0, after_black=0):
+        for i in range(before_black):
+            self._append(_EMPTY_PARAGRAPH)
+
+        if content:
+            self._append(paragraph_xml(content))
+
+        for i in range(after_black):
+            self._append(_EMPTY_PARAGRAPH)
+
+    def begin_code(self, code):
+        """写入单个编码的标题段落"""
+        self.add_paragraph(f"编码:{code} 模板如下：", before_black=1, after_black=1)
+
+    def body_length(self):
+        """已写入的正文块数量，供 export_body_xml 截取"""
+        return len(self._blocks)
+
+    def document_stats(self):
+        """文档规模统计：正文段落数量，以及已保存文件的字节数"""
+        file_bytes = None
+        if self.file_name and isinstance(self.file_name, str) and os.path.exists(self.file_name):
+            file_bytes = os.path.getsize(self.file_name)
+        return {'body_elements': sum(self._block_paragraphs), 'file_bytes': file_bytes}
+
+    def export_body_xml(self, start=0):
+        """导出从 start 开始的正文块，供其他进程中同类格式化器的 append_code_xml 拼接"""
+        return list(zip(self._blocks[start:], self._block_paragraphs[start:]))
+
+    def append_code_xml(self, code, fragments):
+        for block, paragraphs in fragments:
+            self._append(block, paragraphs)
+
+    def format_and_save_word(self, text_parts, style_parts, code, language, fragment_cache=None):
+        """生成一封邮件的正文 XML；相同语言与内容组合只生成一次，之后直接复用（字符串不可变，无需复制）"""
+        fragment_cache = fragment_cache if fragment_cache is not None else self.fragment_cache
+        key = (language, tuple(text_parts))
+        fragment = fragment_cache.get(key) if fragment_cache is not None else None
+        if fragment is None:
+            fragment = self._build_email(text_parts, style_parts, language)
+            if fragment_cache is not None:
+                fragment_cache.put(key, fragment)
+        self._append(*fragment)
+
+    @staticmethod
+    def _build_email(text_parts, style_parts, language):
+        """生成一封邮件（问候语、各问题及结束语）的段落，返回 (XML, 段落数)；结构同 WordFormatter._build_email"""
+        greeting = GREETINGS.get(language, "Hello Seller,")
+        closing = CLOSINGS.get(language, "If you have any questions, please contact us in time. Thanks！")
+
+        paragraphs = [paragraph_xml(greeting), _EMPTY_PARAGRAPH]
+        for i, (text, styles) in enumerate(zip(text_parts, style_parts)):
+            if i > 0:
+                paragraphs.append(_EMPTY_PARAGRAPH)
+
+            question_title = f"Question {i + 1}:" if language == 'EN' else f"问题 {i + 1}:"
+            paragraphs.append(paragraph_xml(question_title))
+
+            if not styles:
+                runs = run_xml(text) if text else ''
+            else:
+                runs = ''.join(run_xml(text[style_run.start:style_run.end], style_run.style) for style_run in styles)
+            paragraphs.append(f'<w:p>{runs}</w:p>' if runs else _EMPTY_PARAGRAPH)
+
+        paragraphs.append(_EMPTY_PARAGRAPH)
+        paragraphs.append(paragraph_xml(closing))
+        return ''.join(paragraphs), len(paragraphs)
+
+    def save(self):
+        self._append(_EMPTY_PARAGRAPH)
+        self._append(paragraph_xml(SIGNATURE))
+
+        parts, document_head, document_tail = _package_template()
+        with zipfile.ZipFile(self.file_name, 'w', compression=zipfile.ZIP_DEFLATED) as package:
+            for name, data in parts:
+                if name != 'word/document.xml':
+                    package.writestr(name, data)
+                    continue
+                # 正文按 _WRITE_BLOCKS 块一组编码写入，不在内存中拼出整个 document.xml
+                with package.open(name, 'w') as document:
+                    document.write(document_head)
+                    blocks = self._blocks
+                    for start in range(0, len(blocks), _WRITE_BLOCKS):
+                        document.write(''.join(blocks[start:start + _WRITE_BLOCKS]).encode('utf-8'))
+                    document.write(document_tail)
@@ -0,0 +1,106 @@
+# src/data/bundled_data.py
+import os
+import pickle
+import struct
+import time
+import zlib
+from .hts_data_loader import HTSDataLoader
+from .email_template_loader import EmailTemplateLoader
+from .data_cache import CACHE_FORMAT_VERSION, file_sha256
+
+# 文件头：魔数 + 格式版本（与解析缓存共用 CACHE_FORMAT_VERSION，索引或模板结构变化时旧快照自动失效）
+_MAGIC = b'HTSDATA\n'
+_HEADER = struct.Struct('<8sI')
+
+
+class DataBundle:
+    """构建时预编译的数据快照：已构建的 HTS 前缀索引与已解析样式的邮件模板，随 exe 打包
+
+    启动时直接反序列化，无需解析 Excel；exe 同目录下放有内容不同且更新的工作簿时改用该工作簿。
+    快照内记录了源工作簿的大小、修改时间与 SHA-256，用于判断工作簿是否更新。
+    """
+
+    @staticmethod
+    def build(hts_db_path, template_path, output_path, backend=None):
+        """解析两个工作簿并写出数据快照，返回快照信息（不含数据）"""
+        payload = {
+            'hts_index': HTSDataLoader.load_hts_index(hts_db_path, backend=backend),
+            'email_templates': EmailTemplateLoader.load_email_templates(template_path, backend=backend),
+            'sources': {
+                'hts_index': DataBundle._source_info(hts_db_path),
+                'email_templates': DataBundle._source_info(template_path)
+            },
+            'built_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        data = zlib.compress(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL), 9)
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, CACHE_FORMAT_VERSION))
+            f.write(data)
+        os.replace(tmp_path, output_path)
+        return {
+            'path': output_path,
+            'size': _HEADER.size + len(data),
+            'codes': len(payload['hts_index'].sorted_codes),
+            'labels': len(payload['email_templates']),
+            'sources': payload['sources'],
+            'built_at': payload['built_at']
+        }
+
+    @staticmethod
+    def load(path):
+        """读取数据快照；文件格式或版本不符时抛出 ValueError"""
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise ValueError("数据快照文件不完整")
+            magic, version = _HEADER.unpack(header)
+            if magic != _MAGIC:
+                raise ValueError("不是有效的数据快照文件")
+            if version != CACHE_FORMAT_VERSION:
+                raise ValueError(f"数据快照版本 {version} 与当前程序（{CACHE_FORMAT_VERSION}）不符，请重新构建")
+            payload = pickle.loads(zlib.decompress(f.read()))
+        if not isinstance(payload, dict) or 'hts_index' not in payload or 'email_templates' not in payload:
+            raise ValueError("数据快照内容不完整")
+        return payload
+
+    @staticmethod
+    def load_if_present(path, logger_func=None):
+        """存在时读取数据快照，不存在或无法使用时返回 None（改为读取工作簿）"""
+        logger_func = logger_func or (lambda msg: None)
+        if not os.path.exists(path):
+            return None
+        try:
+            return DataBundle.load(path)
+        except Exception as e:
+            logger_func(f"❌ 内置数据快照无法使用，将读取工作簿: {e}\n")
+            return None
+
+    @staticmethod
+    def select(bundle, kind, workbook_path, logger_func=None):
+        """返回快照中 kind（'hts_index' 或 'email_templates'）的数据；没有快照，或 workbook_path 处有内容不同
+        且修改时间晚于快照源文件的工作簿时返回 None，由调用方读取该工作簿"""
+        logger_func = logger_func or (lambda msg: None)
+        if bundle is None:
+            return None
+        source = bundle['sources'][kind]
+        try:
+            stat = os.stat(workbook_path)
+        except OSError:
+            return bundle[kind]
+        name = os.path.basename(workbook_path)
+        if stat.st_size == source['size'] and stat.st_mtime_ns == source['mtime_ns']:
+            return bundle[kind]
+        if stat.st_size == source['size'] and file_sha256(workbook_path) == source['sha256']:
+            return bundle[kind]
+        if stat.st_mtime_ns > source['mtime_ns']:
+            logger_func(f"发现比内置数据更新的 {name}，将读取该工作簿\n")
+            return None
+        logger_func(f"{name} 早于内置数据（构建于 {bundle['built_at']}），继续使用内置数据\n")
+        return bundle[kind]
+
+    @staticmethod
+    def _source_info(path):
+        stat = os.stat(path)
+        return {'name': os.path.basename(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                'sha256': file_sha256(path)}
@@ -0,0 +1,89 @@
+# src/data/data_cache.py
+import hashlib
+import os
+import pickle
+from ..utils.helpers import user_cache_dir
+from config.settings import DATA_CACHE_DIR
+
+# 缓存内容结构变化时递增，旧缓存将自动失效
+CACHE_FORMAT_VERSION = 6
+
+
+def file_sha256(file_path):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DataCache:
+    """已解析数据的二进制缓存：以源文件大小、修改时间和内容哈希判断是否失效"""
+
+    def __init__(self, cache_dir=None, logger_func=None):
+        self.cache_dir = cache_dir or DATA_CACHE_DIR or user_cache_dir()
+        self.logger_func = logger_func or (lambda msg: None)
+
+    def cache_path(self, source_path, kind, variant=None):
+        """缓存文件路径：按源文件绝对路径区分，同一目录可缓存多个工作簿；variant 区分同一文件的不同解析方式
+        （如 Excel 读取方式），各自缓存，切换后不会读到另一种方式的结果"""
+        path_key = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:16]
+        if variant:
+            kind = f"{kind}_{variant}"
+        return os.path.join(self.cache_dir, f"{kind}_{path_key}.pkl")
+
+    def load(self, source_path, kind, build_func, rebuild=False, variant=None):
+        """返回缓存中的数据；缓存缺失或失效时调用 build_func(source_path) 重新生成并写入缓存"""
+        stat = os.stat(source_path)
+        cache_path = self.cache_path(source_path, kind, variant)
+        name = os.path.basename(source_path)
+
+        entry = None if rebuild else self._read(cache_path)
+        if entry is not None:
+            if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                self.logger_func(f"缓存命中: {name}\n")
+                return entry['data']
+            # 大小或修改时间变化时再比较内容哈希，避免仅因复制/touch 而重新解析
+            if entry['size'] == stat.st_size and entry['sha256'] == file_sha256(source_path):
+                entry['mtime_ns'] = stat.st_mtime_ns
+                self._write(cache_path, entry)
+                self.logger_func(f"缓存命中（内容未变）: {name}\n")
+                return entry['data']
+
+        self.logger_func(f"缓存{'重建' if rebuild else '未命中'}: {name}，正在解析 Excel...\n")
+        data = build_func(source_path)
+        self._write(cache_path, {
+            'version': CACHE_FORMAT_VERSION,
+            'kind': kind,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(source_path),
+            'data': data
+        })
+        return data
+
+    def _read(self, cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger_func(f"❌ 缓存文件损坏，将重新生成: {e}\n")
+            return None
+        if not isinstance(entry, dict) or entry.get('version') != CACHE_FORMAT_VERSION:
+            return None
+        return entry
+
+    def _write(self, cache_path, entry):
+        """先写临时文件再替换，避免并发读取到半个缓存文件"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            # 缓存写入失败不影响正常使用
+            self.logger_func(f"❌ 写入缓存失败: {e}\n")
@@ -1,17 +1,42 @@
 # src/data/email_template_loader.py
-import pandas as pd
 import os
+from functools import lru_cache
 from ..utils.helpers import parse_blurb_with_tags
-from config.settings import TAG_RED_START, TAG_RED_END, TAG_BOLD_START, TAG_BOLD_END, TAG_REDBOLD_START, TAG_REDBOLD_END
+from ..core.style_runs import compile_style_runs
+from .xlsx_reader import iter_sheet_rows, header_names, is_missing
+from config.settings import LOADER_BACKEND, TAG_RED_START, TAG_RED_END, TAG_BOLD_START, TAG_BOLD_END, TAG_REDBOLD_START, TAG_REDBOLD_END
+
+
+@lru_cache(maxsize=4096)
+def _parse_blurb(raw_text):
+    """解析单条模板文本，返回 (纯文本, StyleRun 元组)；按原始文本记忆结果，重新加载时只有内容变化的行需要重新解析"""
+    text, styled_parts = parse_blurb_with_tags(raw_text, TAG_RED_START, TAG_RED_END, TAG_BOLD_START,
+                                               TAG_BOLD_END, TAG_REDBOLD_START, TAG_REDBOLD_END)
+    return text, compile_style_runs(styled_parts)
 
 
 class EmailTemplateLoader:
     @staticmethod
-    def load_email_templates(file_path):
-        """加载邮件模板文件，支持样式标签"""
+    def load_email_templates(file_path, cache=None, rebuild_cache=False, backend=None):
+        """加载邮件模板文件，支持样式标签；提供 cache 时优先使用已缓存的解析结果
+
+        backend 为 'openpyxl' 或 'pandas'，默认取 LOADER_BACKEND。
+        """
+        if cache is not None:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"邮件模板文件不存在: {file_path}")
+            return cache.load(file_path, 'email_templates',
+                              lambda path: EmailTemplateLoader.load_email_templates(path, backend=backend),
+                              rebuild=rebuild_cache, variant=backend or LOADER_BACKEND)
+
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"邮件模板文件不存在: {file_path}")
 
+        if (backend or LOADER_BACKEND) != 'pandas':
+            return EmailTemplateLoader.load_from_cells(file_path)
+
+        # pandas 导入耗时较长，只在需要解析 Excel（缓存未命中）时才导入
+        import pandas as pd
         try:
             df = pd.read_excel(file_path, sheet_name=0, usecols="A:C", header=0)
             df = df.dropna(subset=['Issue Details Description'])
@@ -25,10 +50,8 @@ class EmailTemplateLoader:
             raw_english = str(row.get('English Email Blurb', '')).strip().rstrip('\n')
             raw_chinese = str(row.get('Chinese Email Blurb', '')).strip().rstrip('\n')
 
-            en_text, en_styles = parse_blurb_with_tags(raw_english, TAG_RED_START, TAG_RED_END, TAG_BOLD_START,
-                                                       TAG_BOLD_END, TAG_REDBOLD_START, TAG_REDBOLD_END)
-            ch_text, ch_styles = parse_blurb_with_tags(raw_chinese, TAG_RED_START, TAG_RED_END, TAG_BOLD_START,
-                                                       TAG_BOLD_END, TAG_REDBOLD_START, TAG_REDBOLD_END)
+            en_text, en_styles = _parse_blurb(raw_english)
+            ch_text, ch_styles = _parse_blurb(raw_chinese)
 
             email_dict[label] = {
                 'english_text': en_text,
@@ -37,4 +60,44 @@ class EmailTemplateLoader:
                 'chinese_styles': ch_styles
             }
 
-        return email_dict
\ No newline at end of file
+        return email_dict
+
+    @staticmethod
+    def load_from_cells(file_path):
+        """以 openpyxl 只读模式逐行读取 A:C 三列构建模板字典，不依赖 pandas，结果与 pandas 方式一致"""
+        def text(row, pos):
+            # 与 pandas 方式一致：没有该列时为空字符串，缺失的单元格经 str() 后为 'nan'
+            if pos is None:
+                return ''
+            value = row[pos] if pos < len(row) else None
+            return 'nan' if is_missing(value) else str(value)
+
+        email_dict = {}
+        try:
+            rows = iter_sheet_rows(file_path, max_col=3)
+            columns = header_names(next(rows, ()))
+            label_pos = columns.index('Issue Details Description')
+            english_pos = columns.index('English Email Blurb') if 'English Email Blurb' in columns else None
+            chinese_pos = columns.index('Chinese Email Blurb') if 'Chinese Email Blurb' in columns else None
+
+            for row in rows:
+                if label_pos >= len(row) or is_missing(row[label_pos]):
+                    continue
+                label = str(row[label_pos]).strip()
+
+                raw_english = text(row, english_pos).strip().rstrip('\n')
+                raw_chinese = text(row, chinese_pos).strip().rstrip('\n')
+
+                en_text, en_styles = _parse_blurb(raw_english)
+                ch_text, ch_styles = _parse_blurb(raw_chinese)
+
+                email_dict[label] = {
+                    'english_text': en_text,
+                    'english_styles': en_styles,
+                    'chinese_text': ch_text,
+                    'chinese_styles': ch_styles
+                }
+        except Exception as e:
+            raise Exception(f"读取邮件模板文件失败: {e}")
+
+        return email_dict
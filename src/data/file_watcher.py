@@ -0,0 +1,74 @@
+# src/data/file_watcher.py
+import os
+import threading
+from .data_cache import file_sha256
+from config.settings import HOT_RELOAD_INTERVAL
+
+
+class FileWatcher:
+    """以轮询方式在后台线程监视文件变化（不依赖第三方库）
+
+    文件大小或修改时间变化后，等到下一轮检查仍保持不变（Excel 保存过程中会先删除再重命名临时文件）
+    且内容哈希确实改变时，才以该文件路径调用 on_change；仅被复制或 touch 的文件不会触发。
+    """
+
+    def __init__(self, paths, on_change, interval=HOT_RELOAD_INTERVAL, logger_func=None):
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.interval = interval
+        self.logger_func = logger_func or (lambda msg: None)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _signature(path):
+        """文件的 (大小, 修改时间)，文件不存在时为 None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def _digest(path):
+        try:
+            return file_sha256(path)
+        except OSError:
+            return None
+
+    def start(self):
+        """启动监视线程（守护线程，随程序退出）"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="FileWatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        signatures = {path: self._signature(path) for path in self.paths}
+        digests = {path: self._digest(path) for path in self.paths}
+        pending = {}
+        while not self._stop_event.wait(self.interval):
+            for path in self.paths:
+                signature = self._signature(path)
+                if signature == signatures[path]:
+                    pending.pop(path, None)
+                    continue
+                # 文件缺失或仍在写入时等待下一轮，直到大小与修改时间稳定
+                if signature is None or pending.get(path) != signature:
+                    pending[path] = signature
+                    continue
+                del pending[path]
+                signatures[path] = signature
+
+                digest = self._digest(path)
+                if digest is None or digest == digests[path]:
+                    continue
+                digests[path] = digest
+                try:
+                    self.on_change(path)
+                except Exception as e:
+                    # 回调失败不应终止监视线程
+                    self.logger_func(f"❌ 处理文件变化失败 {os.path.basename(path)}: {e}\n")
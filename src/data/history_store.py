@@ -0,0 +1,90 @@
+# src/data/history_store.py
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from ..utils.helpers import user_data_dir
+from config.settings import HISTORY_DB_PATH, HISTORY_MAX_ROWS
+
+# GLOB 通配符，搜索词中出现时按普通字符忽略
+_GLOB_SPECIAL = re.compile(r'[*?\[\]]')
+
+
+class HistoryStore:
+    """界面生成结果的历史记录，保存在 SQLite 数据库中，重启后仍可查看
+
+    内存中不保留结果，界面按页读取编码列表、选中时再读取完整内容；可在后台线程写入（内部加锁）。
+    """
+
+    def __init__(self, path=None, max_rows=HISTORY_MAX_ROWS):
+        """path 为数据库文件（':memory:' 表示仅在内存中），默认取 HISTORY_DB_PATH 或用户数据目录"""
+        self.path = path or HISTORY_DB_PATH or os.path.join(user_data_dir(), 'history.sqlite3')
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, code TEXT NOT NULL, created REAL NOT NULL, "
+                "matched_columns TEXT NOT NULL, en_content TEXT, ch_content TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS history_code ON history (code)")
+
+    @staticmethod
+    def _where(search):
+        """按编码前缀搜索的条件子句与参数"""
+        pattern = _GLOB_SPECIAL.sub('', search or '').strip()
+        if not pattern:
+            return '', ()
+        return ' WHERE code GLOB ?', (pattern + '*',)
+
+    def add_many(self, results):
+        """在一个事务中写入一批结果，超出 max_rows 时删除最早的记录；返回写入条数"""
+        now = time.time()
+        rows = [(result['code'], now, json.dumps(result['matched_columns'], ensure_ascii=False),
+                 result['en_content'], result['ch_content']) for result in results]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO history (code, created, matched_columns, en_content, ch_content) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            if self.max_rows > 0:
+                self._conn.execute("DELETE FROM history WHERE id <= (SELECT MAX(id) FROM history) - ?",
+                                   (self.max_rows,))
+        return len(rows)
+
+    def count(self, search=None):
+        where, params = self._where(search)
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM history" + where, params).fetchone()[0]
+
+    def page(self, offset, limit, search=None):
+        """按时间倒序（最新在前）返回一页 [(记录 id, 编码), ...]"""
+        where, params = self._where(search)
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, code FROM history" + where + " ORDER BY id DESC LIMIT ? OFFSET ?",
+                params + (limit, offset)
+            ).fetchall()
+
+    def get(self, entry_id):
+        """读取一条记录的完整结果（结构同 process_multi_code 的结果），不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT code, matched_columns, en_content, ch_content FROM history WHERE id = ?", (entry_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'code': row[0], 'matched_columns': json.loads(row[1]), 'en_content': row[2], 'ch_content': row[3]}
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM history")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,6 +1,9 @@
 # src/data/hts_data_loader.py
-import pandas as pd
 import os
+from ..core.hts_index import HTSPrefixIndex, normalize_code
+from .xlsx_reader import iter_sheet_rows, header_names
+from config.settings import LOADER_BACKEND
+
 
 class HTSDataLoader:
     @staticmethod
@@ -8,8 +11,53 @@ class HTSDataLoader:
         """加载 HTS 数据库"""
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"HTS 数据库文件不存在: {file_path}")
+        # pandas 导入耗时较长，只在需要解析 Excel（缓存未命中）时才导入
+        import pandas as pd
         try:
             df = pd.read_excel(file_path, header=0, engine='openpyxl')
             return df
         except Exception as e:
-            raise Exception(f"读取 HTS 数据库失败: {e}")
\ No newline at end of file
+            raise Exception(f"读取 HTS 数据库失败: {e}")
+
+    @staticmethod
+    def build_index_from_cells(file_path):
+        """以 openpyxl 只读模式逐行读取 HTS 数据库并直接构建前缀索引，不依赖 pandas"""
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"HTS 数据库文件不存在: {file_path}")
+        try:
+            rows = iter_sheet_rows(file_path)
+            header = list(next(rows, ()))
+            # 与 pandas 一致：去掉表头末尾的空单元格，列数取所有行中最后一个非空单元格的位置
+            while header and header[-1] is None:
+                header.pop()
+            width = len(header)
+            entries = []
+            for row in rows:
+                for column_pos, value in enumerate(row):
+                    if value is None:
+                        continue
+                    if column_pos >= width:
+                        width = column_pos + 1
+                    code = normalize_code(value)
+                    if code is not None:
+                        entries.append((code, column_pos))
+        except Exception as e:
+            raise Exception(f"读取 HTS 数据库失败: {e}")
+        return HTSPrefixIndex(header_names(header, width), entries)
+
+    @staticmethod
+    def load_hts_index(file_path, cache=None, rebuild_cache=False, backend=None):
+        """加载 HTS 数据库并构建前缀索引；提供 cache 时优先使用已缓存的索引
+
+        backend 为 'openpyxl' 或 'pandas'，默认取 LOADER_BACKEND。
+        """
+        def build(path):
+            if (backend or LOADER_BACKEND) == 'pandas':
+                return HTSPrefixIndex.from_dataframe(HTSDataLoader.load_hts_database(path))
+            return HTSDataLoader.build_index_from_cells(path)
+
+        if cache is None:
+            return build(file_path)
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"HTS 数据库文件不存在: {file_path}")
+        return cache.load(file_path, 'hts_index', build, rebuild=rebuild_cache, variant=backend or LOADER_BACKEND)
@@ -0,0 +1,53 @@
+# src/data/xlsx_reader.py
+import os
+
+# pandas 默认识别为缺失值的字符串，保持两种加载方式的结果一致
+NA_STRINGS = frozenset({
+    '', '-1.#IND', '1.#QNAN', '1.#IND', '-1.#QNAN', '#N/A N/A', '#N/A', 'N/A', 'n/a', 'NA', '<NA>', '#NA',
+    'NULL', 'null', 'NaN', '-NaN', 'nan', '-nan', 'None'
+})
+
+
+def cell_value(value):
+    """与 pandas 读取 Excel 时一致：整数值的浮点单元格转为 int"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def is_missing(value):
+    """单元格在 pandas 中是否会被读成缺失值"""
+    return value is None or (isinstance(value, str) and value in NA_STRINGS)
+
+
+def header_names(values, width=None):
+    """按 pandas 规则生成列名：空表头为 'Unnamed: n'，重复列名依次加 '.1'、'.2' 后缀"""
+    values = list(values)
+    if width is not None and width > len(values):
+        values.extend([None] * (width - len(values)))
+    names = []
+    seen = {}
+    for pos, value in enumerate(values):
+        name = f"Unnamed: {pos}" if is_missing(value) else value
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(f"{name}.{count}" if count else name)
+    return names
+
+
+def iter_sheet_rows(file_path, max_col=None):
+    """以 openpyxl 只读模式流式读取第一个工作表，逐行产出单元格值元组（第一行为表头）
+
+    只读模式按需解析 XML，不会把整个工作表载入内存，也不需要 pandas。
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        for row in sheet.iter_rows(max_col=max_col, values_only=True):
+            yield tuple(cell_value(value) for value in row)
+    finally:
+        workbook.close()
@@ -1,41 +1,67 @@
 # src/gui/app.py
 import tkinter as tk
-from tkinter import scrolledtext, messagebox
+from tkinter import scrolledtext, messagebox, ttk
 import threading
 import queue
 import traceback
 import os
-from src.core.processor import HTSProcessor
 from src.data.hts_data_loader import HTSDataLoader
 from src.data.email_template_loader import EmailTemplateLoader
-from src.utils.helpers import resource_path
-from config.settings import HTS_DB_FILENAME, EMAIL_TEMPLATE_FILENAME
+from src.data.data_cache import DataCache
+from src.data.bundled_data import DataBundle
+from src.data.file_watcher import FileWatcher
+from src.data.history_store import HistoryStore
+from src.utils.helpers import data_file_path
+from config.settings import (HTS_DB_FILENAME, EMAIL_TEMPLATE_FILENAME, DATA_BUNDLE_FILENAME, DATA_CACHE_ENABLED,
+                             HOT_RELOAD_ENABLED, HISTORY_PAGE_SIZE, GUI_LOG_MAX_LINES, GUI_LOG_BATCH_SIZE,
+                             SUGGEST_MIN_DIGITS, SUGGEST_DELAY_MS)
 
 
 class HTSEmailGeneratorApp:
-    def __init__(self, root):
+    def __init__(self, root, rebuild_cache=False):
         self.root = root
+        self.rebuild_cache = rebuild_cache
         self.root.title("HTS 邮件生成器")
         self.root.geometry("1000x700")  # 增大窗口尺寸
 
-        # 历史记录存储
-        self.history = []
+        # 历史记录存储在 SQLite 中，界面只保留当前页的记录 id
+        self.history_store = None
+        self.history_page = 0
+        self.history_ids = []
 
-        # --- 文件路径 ---
-        self.hts_db_path = resource_path(HTS_DB_FILENAME)
-        self.blurb_file_path = resource_path(EMAIL_TEMPLATE_FILENAME)
+        # --- 文件路径（打包后工作簿位于 exe 同目录，数据快照内置于 exe） ---
+        self.hts_db_path = data_file_path(HTS_DB_FILENAME)
+        self.blurb_file_path = data_file_path(EMAIL_TEMPLATE_FILENAME)
+        self.bundle_path = data_file_path(DATA_BUNDLE_FILENAME, bundled=True)
+        # 启动时读取的内置数据快照（没有或无法使用时为 None），热更新时按同样的规则选择数据来源
+        self.bundle = None
 
         # --- 用于线程间通信的队列 ---
         self.log_queue = queue.Queue()
 
-        # --- 核心处理器 ---
-        self.processor: HTSProcessor = None
+        # --- 核心处理器（后台加载完成后创建） ---
+        self.processor = None
+        self.loading = False
+        # 加载期间提交的编码，加载完成后自动处理
+        self.pending_codes = []
+        self.file_watcher = None
+        # 设置后后台处理在编码之间停止，已生成的内容照常保存
+        self.cancel_event = threading.Event()
+
+        # 输入联想：防抖定时器、查询序号（只显示最新一次查询的结果）与当前列出的候选编码
+        self.suggest_job = None
+        self.suggest_seq = 0
+        self.suggest_codes = []
 
         # --- 创建 GUI 元素 ---
         self.create_widgets()
+        self.open_history()
+
+        # 日志队列在整个运行期间持续轮询，后台加载与热更新的消息也能及时显示
+        self.root.after(100, self.check_log_queue)
 
-        # --- 检查并加载文件 ---
-        self.check_and_load_files()
+        # --- 在后台线程检查并加载文件，窗口立即显示并可输入 ---
+        self.start_loading()
 
     def create_widgets(self):
         # 主容器使用网格布局
@@ -50,6 +76,15 @@ class HTSEmailGeneratorApp:
         self.entry_code = tk.Entry(input_frame, width=50)
         self.entry_code.pack(side='left', padx=(5, 0), fill='x', expand=True)
         self.entry_code.bind('<Return>', self.on_generate_click)
+        self.entry_code.bind('<KeyRelease>', self.on_code_typed)
+        self.entry_code.bind('<Down>', self.focus_suggestions)
+        self.entry_code.bind('<Escape>', self.hide_suggestions)
+
+        # 输入联想下拉列表：有候选时浮在输入框下方
+        self.suggest_listbox = tk.Listbox(self.root, height=8, activestyle='dotbox')
+        self.suggest_listbox.bind('<Double-Button-1>', self.accept_suggestion)
+        self.suggest_listbox.bind('<Return>', self.accept_suggestion)
+        self.suggest_listbox.bind('<Escape>', self.hide_suggestions)
 
         self.btn_generate = tk.Button(input_frame, text="生成邮件", command=self.on_generate_click)
         self.btn_generate.pack(side='right', padx=(5, 0))
@@ -63,6 +98,23 @@ class HTSEmailGeneratorApp:
         history_frame.grid(row=1, column=0, sticky='nsew', padx=(0, 10))
         tk.Label(history_frame, text="历史记录").pack(anchor='w')
 
+        search_frame = tk.Frame(history_frame)
+        search_frame.pack(fill='x', pady=(5, 0))
+        tk.Label(search_frame, text="搜索编码:").pack(side='left')
+        self.entry_search = tk.Entry(search_frame)
+        self.entry_search.pack(side='left', fill='x', expand=True, padx=(5, 0))
+        self.entry_search.bind('<KeyRelease>', self.on_history_search)
+
+        # 分页显示：列表中只有当前页的编码，完整内容在选中时从数据库读取
+        pager_frame = tk.Frame(history_frame)
+        pager_frame.pack(side='bottom', fill='x', pady=(5, 0))
+        self.btn_prev_page = tk.Button(pager_frame, text="上一页", command=lambda: self.change_history_page(-1))
+        self.btn_prev_page.pack(side='left')
+        self.btn_next_page = tk.Button(pager_frame, text="下一页", command=lambda: self.change_history_page(1))
+        self.btn_next_page.pack(side='right')
+        self.history_page_var = tk.StringVar()
+        tk.Label(pager_frame, textvariable=self.history_page_var).pack(side='left', fill='x', expand=True)
+
         self.history_listbox = tk.Listbox(history_frame)
         self.history_listbox.pack(fill='both', expand=True, pady=(5, 0))
         self.history_listbox.bind('<<ListboxSelect>>', self.on_history_select)
@@ -83,6 +135,16 @@ class HTSEmailGeneratorApp:
         self.text_output = scrolledtext.ScrolledText(log_frame, state='disabled', wrap='word', height=10)
         self.text_output.pack(fill='both', expand=True, pady=(5, 0))
 
+        # --- 进度区域 ---
+        progress_frame = tk.Frame(main_frame)
+        progress_frame.grid(row=3, column=0, columnspan=2, sticky='ew', pady=(10, 0))
+
+        self.progress_bar = ttk.Progressbar(progress_frame, mode='determinate', maximum=1)
+        self.progress_bar.pack(side='left', fill='x', expand=True)
+
+        self.btn_cancel = tk.Button(progress_frame, text="取消", command=self.on_cancel_click, state='disabled')
+        self.btn_cancel.pack(side='left', padx=(10, 0))
+
         # --- 状态栏 ---
         self.status_var = tk.StringVar()
         self.status_var.set("就绪")
@@ -100,50 +162,178 @@ class HTSEmailGeneratorApp:
 
     def log_message(self, message):
         """向 GUI 文本框添加日志信息"""
+        self.log_messages([message])
+
+    def log_messages(self, messages):
+        """一次插入多条日志：相邻同样式的消息合并为一段，并删除超出 GUI_LOG_MAX_LINES 的最早行"""
+        if not messages:
+            return
+        chunks = []
+        for message in messages:
+            if message.startswith("✅"):
+                tag = "success"
+            elif message.startswith("❌"):
+                tag = "error"
+            else:
+                tag = ""
+            if chunks and chunks[-1] == tag:
+                chunks[-2] += message
+            else:
+                chunks.extend([message, tag])
+
         self.text_output.config(state='normal')
-        if message.startswith("✅"):
-            self.text_output.insert(tk.END, message, "success")
-        elif message.startswith("❌"):
-            self.text_output.insert(tk.END, message, "error")
-        else:
-            self.text_output.insert(tk.END, message)
+        self.text_output.insert(tk.END, *chunks)
+        excess = int(self.text_output.index('end-1c').split('.')[0]) - GUI_LOG_MAX_LINES
+        if excess > 0:
+            self.text_output.delete('1.0', f'{excess + 1}.0')
         self.text_output.config(state='disabled')
         self.text_output.see(tk.END)
 
-    def check_and_load_files(self):
-        """检查文件是否存在并加载数据"""
+    def start_loading(self):
+        """启动后台加载线程"""
+        self.loading = True
         self.status_var.set("正在加载文件...")
-        self.root.update()
+        threading.Thread(target=self.check_and_load_files, daemon=True).start()
 
-        try:
-            df_hts = HTSDataLoader.load_hts_database(self.hts_db_path)
-            self.log_message(f"✅ HTS 数据库加载成功: {self.hts_db_path}\n")
-        except Exception as e:
-            error_msg = f"❌ 加载 HTS 数据库失败: {e}\n请确保 '{HTS_DB_FILENAME}' 文件存在于程序同目录下。\n"
-            self.log_message(error_msg)
-            self.status_var.set("加载 HTS 数据库失败")
-            messagebox.showerror("错误", error_msg)
-            return
+    def check_and_load_files(self):
+        """在后台线程检查文件是否存在并加载数据；进度与结果经日志队列交给主线程更新界面"""
+        def gui_logger(msg):
+            self.log_queue.put(msg)
+
+        def status(text):
+            self.log_queue.put(("STATUS", text))
 
         try:
-            email_blurbs = EmailTemplateLoader.load_email_templates(self.blurb_file_path)
-            self.log_message("✅ 邮件模板加载成功\n")
+            cache = DataCache(logger_func=gui_logger) if DATA_CACHE_ENABLED else None
+            # 有内置数据快照时直接使用，只有同目录下放了更新的工作簿才解析 Excel
+            self.bundle = DataBundle.load_if_present(self.bundle_path, gui_logger)
+
+            status("正在加载 HTS 数据库 (1/3)...")
+            try:
+                hts_index, from_bundle = self.load_data('hts_index', cache, gui_logger, self.rebuild_cache)
+                if from_bundle:
+                    gui_logger(f"✅ HTS 数据库加载成功（内置数据，构建于 {self.bundle['built_at']}）\n")
+                else:
+                    gui_logger(f"✅ HTS 数据库加载成功: {self.hts_db_path}\n")
+            except Exception as e:
+                error_msg = f"❌ 加载 HTS 数据库失败: {e}\n请确保 '{HTS_DB_FILENAME}' 文件存在于程序同目录下。\n"
+                self.log_queue.put(("LOAD_FAILED", "加载 HTS 数据库失败", error_msg))
+                return
+
+            status("正在加载邮件模板 (2/3)...")
+            try:
+                email_blurbs, from_bundle = self.load_data('email_templates', cache, gui_logger, self.rebuild_cache)
+                if from_bundle:
+                    gui_logger(f"✅ 邮件模板加载成功（内置数据，构建于 {self.bundle['built_at']}）\n")
+                else:
+                    gui_logger("✅ 邮件模板加载成功\n")
+            except Exception as e:
+                error_msg = f"❌ 加载邮件模板失败: {e}\n请确保 '{EMAIL_TEMPLATE_FILENAME}' 文件存在于程序同目录下。\n"
+                self.log_queue.put(("LOAD_FAILED", "加载邮件模板失败", error_msg))
+                return
+
+            # 初始化核心处理器；处理器依赖 python-docx，在此导入以免拖慢窗口显示
+            status("正在初始化处理器 (3/3)...")
+            try:
+                from src.core.processor import HTSProcessor
+                processor = HTSProcessor(hts_index, email_blurbs)
+            except Exception as e:
+                self.log_queue.put(("LOAD_FAILED", "初始化处理器失败", f"❌ 初始化处理器失败: {e}\n"))
+                return
+            self.report_missing_labels(processor.snapshot, gui_logger)
+            self.log_queue.put(("LOADED", processor))
+        finally:
+            # 加载失败时也监视文件，修复文件后可自动完成加载
+            if HOT_RELOAD_ENABLED and self.file_watcher is None:
+                self.file_watcher = FileWatcher([self.hts_db_path, self.blurb_file_path], self.reload_changed_file,
+                                                logger_func=gui_logger).start()
+
+    def load_data(self, kind, cache, logger_func, rebuild_cache=False):
+        """加载 kind（'hts_index' 或 'email_templates'）：有内置数据快照且同目录下没有更新的工作簿时
+        使用快照（规则见 DataBundle.select），否则读取工作簿；返回 (数据, 是否来自快照)"""
+        path = self.hts_db_path if kind == 'hts_index' else self.blurb_file_path
+        data = DataBundle.select(self.bundle, kind, path, logger_func)
+        if data is not None:
+            return data, True
+        if kind == 'hts_index':
+            return HTSDataLoader.load_hts_index(path, cache, rebuild_cache), False
+        return EmailTemplateLoader.load_email_templates(path, cache, rebuild_cache), False
+
+    def on_files_loaded(self, processor):
+        """主线程：启用处理器，并处理加载期间排队的编码"""
+        self.processor = processor
+        self.loading = False
+        self.status_var.set("文件加载完成，就绪")
+        self.log_message("✅ 所有文件加载完成，可以开始生成邮件。\n")
+        if self.pending_codes:
+            codes, self.pending_codes = self.pending_codes, []
+            self.log_message(f"开始处理加载期间排队的 {len(codes)} 个编码。\n")
+            self.start_generation(codes)
+
+    def on_load_failed(self, status_text, error_msg):
+        """主线程：显示加载失败信息"""
+        self.loading = False
+        self.log_message(error_msg)
+        self.status_var.set(status_text)
+        if self.pending_codes:
+            self.log_message(f"❌ 排队的 {len(self.pending_codes)} 个编码将在文件修复并重新加载后处理。\n")
+        messagebox.showerror("错误", error_msg)
+
+    def reload_changed_file(self, path):
+        """文件监视线程的回调：在后台只重新加载发生变化的工作簿，再原子切换处理器的数据快照
+
+        正在处理的批次继续使用旧数据完成，之后提交的编码使用新数据；加载失败时保留原数据。
+        有内置数据快照时与启动时的规则相同：只有比快照更新的工作簿才会替换内置数据。
+        """
+        def gui_logger(msg):
+            self.log_queue.put(msg)
+
+        name = os.path.basename(path)
+        gui_logger(f"检测到文件变化: {name}，正在后台重新加载...\n")
+        cache = DataCache(logger_func=gui_logger) if DATA_CACHE_ENABLED else None
+        kind = 'hts_index' if path == self.hts_db_path else 'email_templates'
+        try:
+            data, from_bundle = self.load_data(kind, cache, gui_logger)
+
+            if self.processor is None:
+                # 启动时加载失败，此时需要两份数据齐全才能创建处理器
+                loaded = {kind: data}
+                other = 'email_templates' if kind == 'hts_index' else 'hts_index'
+                loaded[other] = self.load_data(other, cache, gui_logger)[0]
+                from src.core.processor import HTSProcessor
+                processor = HTSProcessor(loaded['hts_index'], loaded['email_templates'])
+                self.report_missing_labels(processor.snapshot, gui_logger)
+                self.log_queue.put(("LOADED", processor))
+                return
         except Exception as e:
-            error_msg = f"❌ 加载邮件模板失败: {e}\n请确保 '{EMAIL_TEMPLATE_FILENAME}' 文件存在于程序同目录下。\n"
-            self.log_message(error_msg)
-            self.status_var.set("加载邮件模板失败")
-            messagebox.showerror("错误", error_msg)
+            gui_logger(f"❌ 重新加载 {name} 失败，继续使用原有数据: {e}\n")
             return
 
-        # 初始化核心处理器
-        self.processor = HTSProcessor(df_hts, email_blurbs)
-
-        self.status_var.set("文件加载完成，就绪")
-        self.log_message("✅ 所有文件加载完成，可以开始生成邮件。\n")
+        snapshot = self.processor.snapshot
+        if data is (snapshot.hts_data if kind == 'hts_index' else snapshot.email_templates):
+            # 工作簿不比内置数据新，当前已在使用内置数据
+            gui_logger(f"{name} 未替换内置数据，数据保持不变\n")
+            return
+        if kind == 'hts_index':
+            snapshot = self.processor.reload_data(hts_data=data)
+        else:
+            snapshot = self.processor.reload_data(email_templates=data)
+        source = "内置数据，" if from_bundle else ""
+        gui_logger(f"✅ {name} 已重新加载（{source}数据版本 {snapshot.version}），之后提交的编码将使用新数据\n")
+        if kind == 'email_templates':
+            self.report_missing_labels(snapshot, gui_logger)
+
+    @staticmethod
+    def report_missing_labels(snapshot, logger_func):
+        """加载邮件模板后报告一次 EMAIL_MAPPING 中在模板里找不到的标签"""
+        report = snapshot.label_table.missing_report()
+        if report:
+            logger_func(report)
 
     def on_generate_click(self, event=None):
         """当点击“生成邮件”按钮或按回车时触发"""
-        if not self.processor:
+        self.hide_suggestions()
+        if not self.processor and not self.loading:
             self.log_message("❌ 请先确保 HTS 数据库和邮件模板已成功加载。\n")
             return
 
@@ -157,12 +347,24 @@ class HTSEmailGeneratorApp:
             messagebox.showwarning("警告", "请输入有效的 HTS 编码。")
             return
 
+        if not self.processor:
+            # 数据仍在加载：先排队，加载完成后自动处理
+            self.pending_codes.extend(codes)
+            self.log_message(f"数据加载中，已排队 {len(self.pending_codes)} 个编码，加载完成后自动处理。\n")
+            return
+
+        self.start_generation(codes)
+
+    def start_generation(self, codes):
+        """禁用输入并在后台线程处理编码"""
         self.btn_generate.config(state='disabled')
         self.entry_code.config(state='disabled')
+        self.cancel_event.clear()
+        self.btn_cancel.config(state='normal')
+        self.progress_bar.config(maximum=max(len(set(codes)), 1), value=0)
         self.status_var.set("处理中...")
 
         threading.Thread(target=self.run_generation, args=(codes,), daemon=True).start()
-        self.root.after(100, self.check_log_queue)
 
     def run_generation(self, codes):
         """在后台线程中执行邮件生成逻辑"""
@@ -170,45 +372,209 @@ class HTSEmailGeneratorApp:
             def gui_logger(msg):
                 self.log_queue.put(msg)
 
+            def gui_events(event):
+                # 逐码事件过多，界面只关心进度、汇总与剖析结果
+                if event['event'] in ('progress', 'batch_done', 'profile'):
+                    self.log_queue.put(("EVENT", event))
+
             unique_codes = list(set(codes))
             # 获取处理结果
-            results = self.processor.process_multi_code(unique_codes, gui_logger)
-            self.log_queue.put("所有编码处理完成。\n")
-            # 将结果放入队列处理
-            self.log_queue.put(("RESULTS", results))
+            results = self.processor.process_multi_code(unique_codes, gui_logger, event_func=gui_events,
+                                                        cancel_event=self.cancel_event)
+            # 在后台线程一次性写入历史记录，界面线程只需刷新当前页并显示最后一个结果
+            self.history_store.add_many(results)
+            if len(results) < len(unique_codes):
+                self.log_queue.put(f"已取消：已处理 {len(results)}/{len(unique_codes)} 个编码，已生成的内容已保存。\n")
+            else:
+                # 取消请求在最后一个编码之后才到达时视为正常完成
+                self.cancel_event.clear()
+                self.log_queue.put("所有编码处理完成。\n")
+            self.log_queue.put(("RESULTS", results[-1] if results else None))
         except Exception as e:
             self.log_queue.put(f"❌ 处理过程中发生未预期错误: {e}\n")
             self.log_queue.put(f"Traceback: {traceback.format_exc()}\n")
         finally:
             self.log_queue.put("<<PROCESSING_COMPLETE>>")
 
+    def current_code_prefix(self):
+        """光标前正在输入的编码（输入框中最后一个空白之后的部分）"""
+        text = self.entry_code.get()[:self.entry_code.index(tk.INSERT)]
+        if not text or text[-1].isspace():
+            return ""
+        return text.split()[-1]
+
+    def on_code_typed(self, event):
+        """输入变化后延迟 SUGGEST_DELAY_MS 查询联想，连续按键只查询最后一次"""
+        if event.keysym in ('Return', 'Down', 'Up', 'Escape', 'Tab'):
+            return
+        if self.suggest_job is not None:
+            self.root.after_cancel(self.suggest_job)
+        self.suggest_job = self.root.after(SUGGEST_DELAY_MS, self.request_suggestions)
+
+    def request_suggestions(self):
+        """在后台线程查询当前输入的联想候选，结果经日志队列回到界面线程"""
+        self.suggest_job = None
+        prefix = self.current_code_prefix()
+        if self.processor is None or len(prefix) < SUGGEST_MIN_DIGITS or not prefix.isdigit():
+            self.hide_suggestions()
+            return
+        self.suggest_seq += 1
+        threading.Thread(target=self.run_suggestions, args=(self.suggest_seq, self.processor, prefix),
+                         daemon=True).start()
+
+    def run_suggestions(self, seq, processor, prefix):
+        """后台线程：二分查找前缀候选及其匹配的列与标签"""
+        total, suggestions = processor.suggest_codes(prefix)
+        self.log_queue.put(("SUGGESTIONS", seq, total, suggestions))
+
+    def show_suggestions(self, seq, total, suggestions):
+        """显示联想候选：编码、将生成的邮件标签与匹配列；已有更新的查询时丢弃"""
+        if seq != self.suggest_seq:
+            return
+        if not suggestions:
+            self.hide_suggestions()
+            return
+        self.suggest_codes = [suggestion['code'] for suggestion in suggestions]
+        lines = [f"{suggestion['code']}  →  {'、'.join(suggestion['labels']) or '无邮件模板'}"
+                 f"（{'、'.join(suggestion['columns'])}）" for suggestion in suggestions]
+        if total > len(suggestions):
+            lines.append(f"…… 共 {total} 个编码，继续输入以缩小范围")
+        self.suggest_listbox.delete(0, tk.END)
+        self.suggest_listbox.insert(tk.END, *lines)
+        self.suggest_listbox.config(height=min(len(lines), 8))
+        self.suggest_listbox.place(in_=self.entry_code, x=0, rely=1.0, relwidth=1.0)
+        self.suggest_listbox.lift()
+
+    def hide_suggestions(self, event=None):
+        """隐藏联想列表，并丢弃尚未返回的查询"""
+        self.suggest_seq += 1
+        self.suggest_codes = []
+        self.suggest_listbox.place_forget()
+        if event is not None and event.widget is self.suggest_listbox:
+            self.entry_code.focus_set()
+
+    def focus_suggestions(self, event=None):
+        """在输入框中按下方向键时进入联想列表"""
+        if not self.suggest_codes:
+            return None
+        self.suggest_listbox.focus_set()
+        self.suggest_listbox.selection_clear(0, tk.END)
+        self.suggest_listbox.selection_set(0)
+        self.suggest_listbox.activate(0)
+        return 'break'
+
+    def accept_suggestion(self, event=None):
+        """用选中的候选编码替换正在输入的编码"""
+        selection = self.suggest_listbox.curselection()
+        if not selection or selection[0] >= len(self.suggest_codes):
+            return 'break'
+        code = self.suggest_codes[selection[0]]
+        cursor = self.entry_code.index(tk.INSERT)
+        start = cursor - len(self.current_code_prefix())
+        text = code if self.entry_code.get()[cursor:cursor + 1].isspace() else code + ' '
+        self.entry_code.delete(start, cursor)
+        self.entry_code.insert(start, text)
+        self.entry_code.icursor(start + len(text))
+        self.entry_code.focus_set()
+        self.hide_suggestions()
+        return 'break'
+
+    def on_cancel_click(self):
+        """请求后台处理在当前编码完成后停止"""
+        self.cancel_event.set()
+        self.btn_cancel.config(state='disabled')
+        self.status_var.set("正在取消...")
+
     def check_log_queue(self):
-        """在主线程中检查日志队列并更新 GUI"""
+        """在主线程中检查日志队列并更新 GUI：每次最多取出 GUI_LOG_BATCH_SIZE 条消息，普通日志合并为一次插入"""
+        lines = []
         try:
-            while True:
+            for _ in range(GUI_LOG_BATCH_SIZE):
                 line = self.log_queue.get_nowait()
+                if isinstance(line, str) and line != "<<PROCESSING_COMPLETE>>":
+                    lines.append(line)
+                    continue
+                # 控制消息可能再写日志，先插入之前累积的日志以保持顺序
+                self.log_messages(lines)
+                lines = []
                 if line == "<<PROCESSING_COMPLETE>>":
                     self.btn_generate.config(state='normal')
                     self.entry_code.config(state='normal')
-                    self.status_var.set("处理完成")
-                    break
+                    self.btn_cancel.config(state='disabled')
+                    self.status_var.set("已取消" if self.cancel_event.is_set() else "处理完成")
                 # 处理结果数据
                 elif isinstance(line, tuple) and line[0] == "RESULTS":
                     self.handle_results(line[1])
-                else:
-                    self.log_message(line)
+                elif isinstance(line, tuple) and line[0] == "EVENT":
+                    self.handle_event(line[1])
+                elif isinstance(line, tuple) and line[0] == "SUGGESTIONS":
+                    self.show_suggestions(*line[1:])
+                elif isinstance(line, tuple) and line[0] == "STATUS":
+                    self.status_var.set(line[1])
+                elif isinstance(line, tuple) and line[0] == "LOADED":
+                    self.on_files_loaded(line[1])
+                elif isinstance(line, tuple) and line[0] == "LOAD_FAILED":
+                    self.on_load_failed(line[1], line[2])
         except queue.Empty:
-            self.root.after(100, self.check_log_queue)
-
-    def handle_results(self, results):
-        """处理生成的邮件内容，更新历史记录"""
-        for result in results:
-            self.history.append(result)
-            self.history_listbox.insert(tk.END, f"编码: {result['code']}")
-
-        # 显示最后一个结果
-        if results:
-            self.display_content(results[-1])
+            pass
+        self.log_messages(lines)
+        self.root.after(10 if not self.log_queue.empty() else 100, self.check_log_queue)
+
+    def handle_event(self, event):
+        """根据处理器的结构化统计事件更新状态栏吞吐量与日志汇总"""
+        if event['event'] == 'progress':
+            self.progress_bar.config(maximum=max(event['total'], 1), value=event['done'])
+            eta = f"，剩余约 {event['eta']:.0f} 秒" if event['eta'] else ""
+            self.status_var.set(f"处理中... {event['done']}/{event['total']}"
+                                f"（{event['codes_per_sec']:.1f} 编码/秒{eta}）")
+        elif event['event'] == 'batch_done':
+            stages = "，".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in event['stages'].items())
+            self.log_message(f"📊 共 {event['codes']} 个编码，耗时 {event['elapsed']:.2f} 秒，"
+                             f"{event['codes_per_sec']:.1f} 编码/秒；{stages}；缓存命中 {event['cache_hits']} 次\n")
+        elif event['event'] == 'profile':
+            detail = event.get('path') or f"峰值内存 {event['peak_kb']:.0f} KB"
+            self.log_message(f"📊 性能剖析（{event['mode']}）: {detail}\n")
+
+    def handle_results(self, last_result):
+        """结果已写入历史记录：回到第一页（最新记录）并显示最后一个结果"""
+        self.history_page = 0
+        self.refresh_history()
+        if last_result is not None:
+            self.display_content(last_result)
+
+    def open_history(self):
+        """打开历史记录数据库并显示第一页；无法打开时改用内存数据库（本次运行内有效）"""
+        try:
+            self.history_store = HistoryStore()
+        except Exception as e:
+            self.log_message(f"❌ 打开历史记录失败，本次运行的记录不会保存: {e}\n")
+            self.history_store = HistoryStore(':memory:')
+        self.refresh_history()
+
+    def refresh_history(self):
+        """按当前搜索词与页码重新读取一页历史记录，一次性填入列表"""
+        search = self.entry_search.get()
+        total = self.history_store.count(search)
+        pages = max((total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE, 1)
+        self.history_page = min(max(self.history_page, 0), pages - 1)
+        rows = self.history_store.page(self.history_page * HISTORY_PAGE_SIZE, HISTORY_PAGE_SIZE, search)
+
+        self.history_ids = [entry_id for entry_id, _ in rows]
+        self.history_listbox.delete(0, tk.END)
+        if rows:
+            self.history_listbox.insert(tk.END, *(f"编码: {code}" for _, code in rows))
+        self.history_page_var.set(f"第 {self.history_page + 1}/{pages} 页，共 {total} 条")
+        self.btn_prev_page.config(state='normal' if self.history_page > 0 else 'disabled')
+        self.btn_next_page.config(state='normal' if self.history_page < pages - 1 else 'disabled')
+
+    def change_history_page(self, step):
+        self.history_page += step
+        self.refresh_history()
+
+    def on_history_search(self, event=None):
+        """搜索词变化时从第一页开始显示匹配的记录（按编码前缀）"""
+        self.history_page = 0
+        self.refresh_history()
 
     def display_content(self, result):
         """在界面上显示邮件内容"""
@@ -232,8 +598,10 @@ class HTSEmailGeneratorApp:
             return
 
         index = selection[0]
-        if 0 <= index < len(self.history):
-            self.display_content(self.history[index])
+        if 0 <= index < len(self.history_ids):
+            result = self.history_store.get(self.history_ids[index])
+            if result is not None:
+                self.display_content(result)
 
     def copy_content(self):
         """复制当前显示的邮件内容到剪贴板"""
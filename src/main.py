@@ -1,13 +1,21 @@
 # src/main.py
+import argparse
+import multiprocessing
 import tkinter as tk
 from gui.app import HTSEmailGeneratorApp
 
 
 def main():
+    parser = argparse.ArgumentParser(description="HTS 邮件生成器")
+    parser.add_argument('--rebuild-cache', action='store_true', help="忽略并重建 Excel 解析缓存")
+    args, _ = parser.parse_known_args()
+
     root = tk.Tk()
-    app = HTSEmailGeneratorApp(root)
+    app = HTSEmailGeneratorApp(root, rebuild_cache=args.rebuild_cache)
     root.mainloop()
 
 
 if __name__ == "__main__":
+    # PyInstaller 打包后启用多进程批处理时需要
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,386 @@
+# src/service.py
+"""本地 HTTP/JSON 服务：启动时只加载一次 HTS 数据库与邮件模板，供其他工具调用匹配与邮件生成。
+
+接口（均返回 JSON，/render/docx 返回 Word 文件）:
+    GET  /health                          服务状态与数据版本
+    GET  /metrics                         各接口的请求数、错误数、编码数与延迟分位数，以及结果缓存统计
+    POST /match        {"codes": [...]}   只匹配，返回每个编码的匹配列及带来各列的 DB 编码与位数
+    POST /render/text  {"codes": [...]}   返回界面显示用的中英文邮件文本
+    POST /render/docx  {"codes": [...]}   返回包含全部编码的 Word 文档
+    后三个接口也支持 GET 查询参数，如 /match?code=8471300100&code=9403608081
+
+匹配与文本生成在线程池中执行；Word 生成为 CPU 密集型，在预载了索引与模板的进程池中执行。
+
+用法示例:
+    python -m src.service --port 8765 --workers 2 --watch
+    curl -s -X POST localhost:8765/render/text -d '{"codes": ["8471300100"]}'
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+
+from src.core.processor import HTSProcessor
+from src.data.hts_data_loader import HTSDataLoader
+from src.data.email_template_loader import EmailTemplateLoader
+from src.data.data_cache import DataCache
+from src.data.file_watcher import FileWatcher
+from src.utils.helpers import source_dir_path, percentile
+from config.settings import (HTS_DB_FILENAME, EMAIL_TEMPLATE_FILENAME, DATA_CACHE_ENABLED, SERVICE_HOST,
+                             SERVICE_PORT, SERVICE_WORKERS, SERVICE_MAX_CODES, SERVICE_IDLE_TIMEOUT,
+                             SERVICE_READ_TIMEOUT)
+
+# 请求体大小上限（字节）
+MAX_BODY_BYTES = 8 * 1024 * 1024
+JSON_CONTENT_TYPE = 'application/json; charset=utf-8'
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+class RequestError(Exception):
+    """请求无效，按 status 返回错误响应"""
+
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_codes(method, query, body):
+    """从 GET 查询参数（code=...，可重复或逗号分隔）或 POST JSON（{"codes": [...]} / {"code": "..."}）读取编码"""
+    if method == 'GET':
+        params = parse_qs(query)
+        codes = [code for value in params.get('code', []) + params.get('codes', []) for code in value.split(',')]
+    elif method == 'POST':
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            raise RequestError("请求体不是有效的 JSON")
+        if not isinstance(data, dict):
+            raise RequestError("请求体必须是 JSON 对象")
+        codes = data.get('codes')
+        if codes is None and 'code' in data:
+            codes = [data['code']]
+        if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+            raise RequestError("codes 必须是字符串列表")
+    else:
+        raise RequestError(f"不支持的请求方法: {method}", HTTPStatus.METHOD_NOT_ALLOWED)
+
+    codes = [code.strip() for code in codes if code.strip()]
+    if not codes:
+        raise RequestError("请至少提供一个 HTS 编码")
+    if len(codes) > SERVICE_MAX_CODES:
+        raise RequestError(f"单个请求最多 {SERVICE_MAX_CODES} 个编码", HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    return codes
+
+
+class ServiceMetrics:
+    """按接口统计请求数、错误数、编码数与延迟；每个接口只保留最近 window 个延迟样本"""
+
+    def __init__(self, window=2048):
+        self.window = window
+        self.start = time.time()
+        self.in_flight = 0
+        self.routes = {}
+
+    def record(self, route, seconds, codes=0, error=False):
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = {'requests': 0, 'errors': 0, 'codes': 0,
+                                          'latencies': deque(maxlen=self.window)}
+        stats['requests'] += 1
+        stats['errors'] += 1 if error else 0
+        stats['codes'] += codes
+        stats['latencies'].append(seconds)
+
+    def summary(self):
+        routes = {}
+        for route, stats in self.routes.items():
+            latencies = sorted(stats['latencies'])
+            routes[route] = {
+                'requests': stats['requests'],
+                'errors': stats['errors'],
+                'codes': stats['codes'],
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'max_ms': (latencies[-1] if latencies else 0) * 1000
+            }
+        return {'uptime_s': time.time() - self.start, 'in_flight': self.in_flight, 'routes': routes}
+
+
+class HTSService:
+    """基于 asyncio 的 HTTP/1.1 服务（支持 keep-alive），所有请求共享同一个 HTSProcessor"""
+
+    def __init__(self, processor, threads=4, logger_func=None):
+        self.processor = processor
+        self.metrics = ServiceMetrics()
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='hts-service')
+        self.logger_func = logger_func or (lambda msg: None)
+        self.server = None
+        self._closed = False
+        self.routes = {
+            '/health': self.handle_health,
+            '/metrics': self.handle_metrics,
+            '/match': self.handle_match,
+            '/render/text': self.handle_render_text,
+            '/render/docx': self.handle_render_docx
+        }
+
+    async def start(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        """开始监听；port 为 0 时由系统分配端口，可从 self.server.sockets 读取"""
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    def close(self):
+        """停止监听并关闭线程池与处理器（含 Word 工作进程池）；可重复调用"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.server is not None:
+            self.server.close()
+        self.executor.shutdown(wait=False)
+        self.processor.close()
+
+    async def handle_connection(self, reader, writer):
+        """读取并处理同一连接上的请求，直到客户端关闭、要求 Connection: close 或空闲 / 读取超时"""
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), SERVICE_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    writer.write(self._response(HTTPStatus.BAD_REQUEST, self._json({'error': "无效的请求行"}),
+                                                keep_alive=False))
+                    break
+
+                # 请求头与请求体需在 SERVICE_READ_TIMEOUT 内读完，缓慢发送的客户端不会一直占用连接
+                try:
+                    headers, body = await asyncio.wait_for(self._read_request(reader), SERVICE_READ_TIMEOUT)
+                except asyncio.TimeoutError:
+                    writer.write(self._response(HTTPStatus.REQUEST_TIMEOUT, self._json({'error': "读取请求超时"}),
+                                                keep_alive=False))
+                    break
+                except RequestError as e:
+                    writer.write(self._response(e.status, self._json({'error': str(e)}), keep_alive=False))
+                    break
+
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close')
+                status, payload, content_type, extra_headers = await self.dispatch(method, target, body)
+                writer.write(self._response(status, payload, content_type, extra_headers, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader):
+        """读取请求头与请求体，返回 (请求头字典, 请求体)；请求头行过长、Content-Length 无效或过大时抛出 RequestError"""
+        headers = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # 单行超过 StreamReader 的长度上限
+                raise RequestError("请求头过长", HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = headers.get('content-length') or '0'
+        if not (length.isascii() and length.isdigit()):
+            raise RequestError(f"无效的 Content-Length: {length}")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise RequestError("请求体过大", HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b''
+        return headers, body
+
+    async def dispatch(self, method, target, body):
+        """路由请求并记录延迟，返回 (状态码, 响应体, Content-Type, 额外响应头)"""
+        url = urlsplit(target)
+        handler = self.routes.get(url.path)
+        if handler is None:
+            return HTTPStatus.NOT_FOUND, self._json({'error': f"未知接口: {url.path}"}), JSON_CONTENT_TYPE, {}
+
+        start = time.perf_counter()
+        self.metrics.in_flight += 1
+        code_count = 0
+        status = HTTPStatus.OK
+        try:
+            payload, content_type, extra_headers, code_count = await handler(method, url.query, body)
+        except RequestError as e:
+            status = e.status
+            payload, content_type, extra_headers = self._json({'error': str(e)}), JSON_CONTENT_TYPE, {}
+        except Exception as e:
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
+            payload, content_type, extra_headers = self._json({'error': str(e)}), JSON_CONTENT_TYPE, {}
+            self.logger_func(f"❌ 处理请求失败 {method} {target}: {e}\n{traceback.format_exc()}")
+        finally:
+            self.metrics.in_flight -= 1
+        elapsed = time.perf_counter() - start
+        self.metrics.record(url.path, elapsed, code_count, status != HTTPStatus.OK)
+        self.logger_func(f"{method} {target} {status.value} {elapsed * 1000:.1f} ms")
+        return status, payload, content_type, extra_headers
+
+    @staticmethod
+    def _json(data):
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    @staticmethod
+    def _response(status, payload, content_type=JSON_CONTENT_TYPE, extra_headers=None, keep_alive=True):
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(payload)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        lines.extend(f"{name}: {value}" for name, value in (extra_headers or {}).items())
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload
+
+    async def _run_in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def handle_health(self, method, query, body):
+        if method != 'GET':
+            raise RequestError(f"不支持的请求方法: {method}", HTTPStatus.METHOD_NOT_ALLOWED)
+        snapshot = self.processor.snapshot
+        return self._json({'status': 'ok', 'data_version': snapshot.version,
+                           'columns': len(snapshot.matcher.index.columns),
+                           'templates': len(snapshot.email_templates)}), JSON_CONTENT_TYPE, {}, 0
+
+    async def handle_metrics(self, method, query, body):
+        if method != 'GET':
+            raise RequestError(f"不支持的请求方法: {method}", HTTPStatus.METHOD_NOT_ALLOWED)
+        metrics = self.metrics.summary()
+        metrics.update({'data_version': self.processor.snapshot.version, 'workers': self.processor.workers,
+                        'cache': self.processor.cache_stats()})
+        return self._json(metrics), JSON_CONTENT_TYPE, {}, 0
+
+    async def handle_match(self, method, query, body):
+        codes = parse_codes(method, query, body)
+        version = self.processor.snapshot.version
+        matches = await self._run_in_thread(self.processor.audit_matches, codes)
+        results = [{'code': code, 'matched_columns': list(columns), 'match_sources': [
+            {'column': column, 'entry': entry, 'level': level} for column, entry, level in sources
+        ]} for code, columns, sources in matches]
+        return self._json({'data_version': version, 'results': results}), JSON_CONTENT_TYPE, {}, len(codes)
+
+    async def handle_render_text(self, method, query, body):
+        codes = parse_codes(method, query, body)
+        version = self.processor.snapshot.version
+        results = await self._run_in_thread(self.processor.render_text, codes)
+        return self._json({'data_version': version, 'results': results}), JSON_CONTENT_TYPE, {}, len(codes)
+
+    async def handle_render_docx(self, method, query, body):
+        codes = parse_codes(method, query, body)
+        if self.processor.workers > 1:
+            results, document = await asyncio.wrap_future(self.processor.submit_render_document(codes))
+        else:
+            results, document = await self._run_in_thread(self.processor.render_document, codes)
+        headers = {
+            'Content-Disposition': 'attachment; filename="HTS_Email.docx"',
+            'X-HTS-Codes': len(results),
+            'X-HTS-Matched': sum(1 for result in results if result['matched_columns'])
+        }
+        return document, DOCX_CONTENT_TYPE, headers, len(codes)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="HTS 邮件生成器（HTTP/JSON 服务）")
+    parser.add_argument('--host', default=SERVICE_HOST, help="监听地址")
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help="监听端口，0 表示自动分配")
+    # 默认使用项目根目录下的数据文件，与运行时的当前目录无关
+    parser.add_argument('--hts-db', default=source_dir_path(HTS_DB_FILENAME), help="HTS 数据库文件")
+    parser.add_argument('--templates', default=source_dir_path(EMAIL_TEMPLATE_FILENAME), help="邮件模板文件")
+    parser.add_argument('--workers', type=int, default=SERVICE_WORKERS,
+                        help="生成 Word 文档的工作进程数，0 或 1 表示在线程池中生成")
+    parser.add_argument('--threads', type=int, default=4, help="匹配与文本生成的线程数")
+    parser.add_argument('--watch', action='store_true', help="监视数据文件，变化后自动重新加载")
+    parser.add_argument('--no-cache', action='store_true', help="不使用 Excel 解析缓存")
+    parser.add_argument('--rebuild-cache', action='store_true', help="忽略并重建 Excel 解析缓存")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出每个请求的访问日志")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    def log(msg):
+        sys.stderr.write(msg if msg.endswith('\n') else msg + '\n')
+
+    load_start = time.perf_counter()
+    cache = DataCache(logger_func=log) if DATA_CACHE_ENABLED and not args.no_cache else None
+    try:
+        hts_index = HTSDataLoader.load_hts_index(args.hts_db, cache, args.rebuild_cache)
+        email_blurbs = EmailTemplateLoader.load_email_templates(args.templates, cache, args.rebuild_cache)
+    except Exception as e:
+        log(f"❌ 加载数据失败: {e}")
+        return 1
+    processor = HTSProcessor(hts_index, email_blurbs, workers=args.workers, profile_mode='')
+    log(f"✅ 数据加载完成，耗时 {time.perf_counter() - load_start:.2f} 秒")
+    missing_report = processor.snapshot.label_table.missing_report()
+    if missing_report:
+        log(missing_report)
+
+    service = HTSService(processor, args.threads, log if args.verbose else None)
+
+    def reload_changed_file(path):
+        name = os.path.basename(path)
+        try:
+            if path == args.hts_db:
+                snapshot = processor.reload_data(hts_data=HTSDataLoader.load_hts_index(path, cache))
+            else:
+                snapshot = processor.reload_data(email_templates=EmailTemplateLoader.load_email_templates(path, cache))
+        except Exception as e:
+            log(f"❌ 重新加载 {name} 失败，继续使用原有数据: {e}")
+            return
+        log(f"✅ {name} 已重新加载（数据版本 {snapshot.version}）")
+        missing_report = snapshot.label_table.missing_report() if path != args.hts_db else ""
+        if missing_report:
+            log(missing_report)
+
+    watcher = FileWatcher([args.hts_db, args.templates], reload_changed_file, logger_func=log).start() \
+        if args.watch else None
+
+    async def serve():
+        server = await service.start(args.host, args.port)
+        port = server.sockets[0].getsockname()[1]
+        log(f"✅ 服务已启动: http://{args.host}:{port}（Word 工作进程 {processor.workers}，Ctrl+C 停止）")
+        async with server:
+            await server.serve_forever()
+
+    # SIGTERM 与 Ctrl+C 一样停止服务，确保 finally 中关闭 Word 工作进程池（否则子进程会遗留）
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # 关闭期间忽略再次收到的停止信号，避免中途打断进程池的关闭
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        if watcher is not None:
+            watcher.stop()
+        service.close()
+    log("服务已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 # src/utils/helpers.py
 import sys
 import os
+import math
 
 
 def resource_path(relative_path):
@@ -14,6 +15,46 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
+def source_dir_path(relative_path):
+    """相对 src 目录解析路径，与当前工作目录无关（settings 中的数据文件路径以 src 目录为基准）"""
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.normpath(os.path.join(src_dir, relative_path))
+
+
+def data_file_path(relative_path, bundled=False):
+    """数据文件路径：开发环境同 resource_path；打包后 bundled=True 时为 exe 内置的文件，否则为 exe 同目录下的文件"""
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS if bundled else os.path.dirname(sys.executable)
+        return os.path.join(base_path, os.path.basename(relative_path))
+    return resource_path(relative_path)
+
+
+def percentile(sorted_values, pct):
+    """最近秩法计算百分位数（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def user_cache_dir(app_name="HTS_Email_Generator"):
+    """返回当前用户的缓存目录（Windows 使用 LOCALAPPDATA，其他平台遵循 XDG 约定）"""
+    if sys.platform == 'win32':
+        base_dir = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+    else:
+        base_dir = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    return os.path.join(base_dir, app_name, 'cache')
+
+
+def user_data_dir(app_name="HTS_Email_Generator"):
+    """返回当前用户的数据目录（Windows 使用 LOCALAPPDATA，其他平台遵循 XDG 约定）"""
+    if sys.platform == 'win32':
+        base_dir = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+        return os.path.join(base_dir, app_name, 'data')
+    base_dir = os.environ.get('XDG_DATA_HOME') or os.path.expanduser(os.path.join('~', '.local', 'share'))
+    return os.path.join(base_dir, app_name)
+
+
 def parse_blurb_with_tags(raw_blurb, tag_red_start, tag_red_end, tag_bold_start, tag_bold_end, tag_redbold_start,
                           tag_redbold_end):
     """解析带有自定义标签的邮件内容，返回 (纯文本, 样式信息列表)"""